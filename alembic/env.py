@@ -12,6 +12,11 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from src.chess_pgn_analyzer_api.models.player import Player
 from src.chess_pgn_analyzer_api.models.game import Game
 from src.chess_pgn_analyzer_api.models.archive import Archive
+from src.chess_pgn_analyzer_api.models.analysis_job import AnalysisJob
+from src.chess_pgn_analyzer_api.models.eco_opening import EcoOpening
+from src.chess_pgn_analyzer_api.models.move_eval import MoveEval
+from src.chess_pgn_analyzer_api.models.player_stats_weekly import PlayerStatsWeekly
+from src.chess_pgn_analyzer_api.models.position_eval import PositionEval
 
 # Import os and load_dotenv to handle environment variables
 import os
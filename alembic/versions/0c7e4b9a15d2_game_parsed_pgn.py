@@ -0,0 +1,45 @@
+"""game parsed pgn
+
+Revision ID: 0c7e4b9a15d2
+Revises: f2c6a8d40e19
+Create Date: 2026-10-18 16:51:27.380914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0c7e4b9a15d2"
+down_revision: Union[str, None] = "f2c6a8d40e19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("game", sa.Column("moves", sa.LargeBinary(), nullable=True))
+    op.add_column("game", sa.Column("ply_count", sa.Integer(), nullable=True))
+    op.add_column(
+        "game", sa.Column("first_move", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+    op.add_column(
+        "game", sa.Column("initial_fen", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+    op.add_column(
+        "game", sa.Column("final_fen", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+    op.add_column("game", sa.Column("clocks", sa.ARRAY(sa.Integer()), nullable=True))
+    # Existing games are parsed with: python -m chess_pgn_analyzer_api.ingest
+
+
+def downgrade() -> None:
+    op.drop_column("game", "clocks")
+    op.drop_column("game", "final_fen")
+    op.drop_column("game", "initial_fen")
+    op.drop_column("game", "first_move")
+    op.drop_column("game", "ply_count")
+    op.drop_column("game", "moves")
@@ -0,0 +1,37 @@
+"""position eval cache
+
+Revision ID: 3f8b2e6d1a95
+Revises: 7a1d5c3e8f26
+Create Date: 2026-10-18 18:47:12.904318
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f8b2e6d1a95"
+down_revision: Union[str, None] = "7a1d5c3e8f26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position_eval",
+        sa.Column("zobrist", sa.BigInteger(), nullable=False),
+        sa.Column("depth", sa.Integer(), nullable=False),
+        sa.Column("engine", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("eval_cp", sa.Integer(), nullable=True),
+        sa.Column("mate", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("zobrist", "depth", "engine"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("position_eval")
@@ -0,0 +1,33 @@
+"""game eco code
+
+Revision ID: 4d92b7e0c6a3
+Revises: e1a7c3f95b08
+Create Date: 2026-10-18 12:31:52.406719
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4d92b7e0c6a3"
+down_revision: Union[str, None] = "e1a7c3f95b08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "game", sa.Column("eco_code", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+    op.create_index(op.f("ix_game_eco_code"), "game", ["eco_code"], unique=False)
+    # Existing games are classified with: python -m chess_pgn_analyzer_api.openings
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_game_eco_code"), table_name="game")
+    op.drop_column("game", "eco_code")
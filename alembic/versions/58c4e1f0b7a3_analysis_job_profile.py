@@ -0,0 +1,37 @@
+"""analysis job profile
+
+Revision ID: 58c4e1f0b7a3
+Revises: 3f8b2e6d1a95
+Create Date: 2026-10-18 19:34:05.118462
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "58c4e1f0b7a3"
+down_revision: Union[str, None] = "3f8b2e6d1a95"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "analysis_job",
+        sa.Column(
+            "profile",
+            sqlmodel.sql.sqltypes.AutoString(),
+            nullable=False,
+            server_default="standard",
+        ),
+    )
+    op.alter_column("analysis_job", "profile", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_job", "profile")
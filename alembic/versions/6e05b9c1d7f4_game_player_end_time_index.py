@@ -0,0 +1,31 @@
+"""game player end_time index
+
+Revision ID: 6e05b9c1d7f4
+Revises: a3f08d6e2c17
+Create Date: 2026-10-18 13:48:21.193507
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6e05b9c1d7f4"
+down_revision: Union[str, None] = "a3f08d6e2c17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_game_player_id_end_time_id",
+        "game",
+        ["player_id", "end_time", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_game_player_id_end_time_id", table_name="game")
@@ -0,0 +1,42 @@
+"""game compact pgn storage
+
+Revision ID: 7a1d5c3e8f26
+Revises: 0c7e4b9a15d2
+Create Date: 2026-10-18 18:02:44.517203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a1d5c3e8f26"
+down_revision: Union[str, None] = "0c7e4b9a15d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("game", sa.Column("pgn_compressed", sa.LargeBinary(), nullable=True))
+    op.alter_column("game", "pgn", existing_type=sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+
+    # Clocks are now delta-encoded bytes. Games parsed with the old integer
+    # array are marked unparsed and picked up again by
+    # python -m chess_pgn_analyzer_api.ingest
+    op.execute("UPDATE game SET ply_count = NULL WHERE clocks IS NOT NULL")
+    op.drop_column("game", "clocks")
+    op.add_column("game", sa.Column("clocks", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("game", "clocks")
+    op.add_column("game", sa.Column("clocks", sa.ARRAY(sa.Integer()), nullable=True))
+    op.execute("UPDATE game SET ply_count = NULL WHERE ply_count IS NOT NULL")
+    # Needs every PGN back as text first:
+    # GAME_PGN_STORAGE=text python -m chess_pgn_analyzer_api.pgn_storage
+    op.alter_column("game", "pgn", existing_type=sqlmodel.sql.sqltypes.AutoString(), nullable=False)
+    op.drop_column("game", "pgn_compressed")
@@ -0,0 +1,61 @@
+"""analysis job queue
+
+Revision ID: 9b3e61d4a7c2
+Revises: f7642ec46928
+Create Date: 2026-10-18 10:12:41.218305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9b3e61d4a7c2"
+down_revision: Union[str, None] = "f7642ec46928"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_job",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("game_id", sa.Integer(), nullable=False),
+        sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_by", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["game_id"],
+            ["game.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("game_id"),
+    )
+    op.create_index(
+        op.f("ix_analysis_job_status"), "analysis_job", ["status"], unique=False
+    )
+
+    # Queue every game that still needs move analysis
+    op.execute(
+        """
+        INSERT INTO analysis_job
+            (game_id, status, attempts, max_attempts, created_at, updated_at)
+        SELECT id, 'pending', 0, 3, now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC'
+        FROM game
+        WHERE moves_analyzed = false
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_analysis_job_status"), table_name="analysis_job")
+    op.drop_table("analysis_job")
@@ -0,0 +1,58 @@
+"""archive conditional sync
+
+Revision ID: a3f08d6e2c17
+Revises: 4d92b7e0c6a3
+Create Date: 2026-10-18 13:15:38.772014
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3f08d6e2c17"
+down_revision: Union[str, None] = "4d92b7e0c6a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "archive", sa.Column("etag", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+    op.add_column(
+        "archive",
+        sa.Column("last_modified", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column(
+        "archive", sa.Column("last_game_end_time", sa.DateTime(), nullable=True)
+    )
+
+    # Start the high-water mark at the newest game already stored per archive
+    op.execute(
+        """
+        UPDATE archive
+        SET last_game_end_time = latest.end_time
+        FROM (
+            SELECT player_id,
+                   EXTRACT(YEAR FROM end_time)::int AS year,
+                   EXTRACT(MONTH FROM end_time)::int AS month,
+                   MAX(end_time) AS end_time
+            FROM game
+            GROUP BY player_id, year, month
+        ) latest
+        WHERE archive.player_id = latest.player_id
+          AND archive.year = latest.year
+          AND archive.month = latest.month
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("archive", "last_game_end_time")
+    op.drop_column("archive", "last_modified")
+    op.drop_column("archive", "etag")
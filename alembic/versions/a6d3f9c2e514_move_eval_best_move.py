@@ -0,0 +1,30 @@
+"""move eval best move
+
+Revision ID: a6d3f9c2e514
+Revises: 58c4e1f0b7a3
+Create Date: 2026-10-18 20:11:38.642907
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a6d3f9c2e514"
+down_revision: Union[str, None] = "58c4e1f0b7a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "move_eval", sa.Column("best_move", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("move_eval", "best_move")
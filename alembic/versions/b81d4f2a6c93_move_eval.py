@@ -0,0 +1,72 @@
+"""move eval
+
+Revision ID: b81d4f2a6c93
+Revises: 6e05b9c1d7f4
+Create Date: 2026-10-18 14:22:09.561830
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b81d4f2a6c93"
+down_revision: Union[str, None] = "6e05b9c1d7f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "move_eval",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("game_id", sa.Integer(), nullable=False),
+        sa.Column("ply", sa.Integer(), nullable=False),
+        sa.Column("side", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("uci", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("eval_cp", sa.Integer(), nullable=True),
+        sa.Column("mate", sa.Integer(), nullable=True),
+        sa.Column("eval_diff", sa.Integer(), nullable=False),
+        sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["game_id"],
+            ["game.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_move_eval_game_id_ply", "move_eval", ["game_id", "ply"], unique=True
+    )
+    op.create_index(
+        op.f("ix_move_eval_category"), "move_eval", ["category"], unique=False
+    )
+
+    # Backfill from the JSON blobs. The old analysis did not record evaluations
+    # or whose move it was, so side follows ply parity and eval_cp/mate stay NULL.
+    op.execute(
+        """
+        INSERT INTO move_eval (game_id, ply, side, uci, eval_diff, category)
+        SELECT game.id,
+               moves.ply,
+               CASE WHEN moves.ply % 2 = 1 THEN 'white' ELSE 'black' END,
+               moves.move ->> 'move',
+               (moves.move ->> 'eval_diff')::int,
+               moves.move ->> 'category'
+        FROM game
+        CROSS JOIN LATERAL json_array_elements(game.move_analysis::json)
+            WITH ORDINALITY AS moves(move, ply)
+        WHERE game.moves_analyzed
+          AND game.move_analysis IS NOT NULL
+          AND game.move_analysis <> ''
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_move_eval_category"), table_name="move_eval")
+    op.drop_index("ix_move_eval_game_id_ply", table_name="move_eval")
+    op.drop_table("move_eval")
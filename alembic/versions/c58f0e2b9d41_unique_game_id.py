@@ -0,0 +1,48 @@
+"""unique game_id
+
+Revision ID: c58f0e2b9d41
+Revises: 9b3e61d4a7c2
+Create Date: 2026-10-18 11:02:17.540182
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c58f0e2b9d41"
+down_revision: Union[str, None] = "9b3e61d4a7c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the oldest row of every duplicated game_id before adding the
+    # unique index that INSERT ... ON CONFLICT (game_id) relies on.
+    op.execute(
+        """
+        DELETE FROM analysis_job
+        USING game duplicate, game original
+        WHERE analysis_job.game_id = duplicate.id
+          AND duplicate.game_id = original.game_id
+          AND duplicate.id > original.id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM game duplicate
+        USING game original
+        WHERE duplicate.game_id = original.game_id
+          AND duplicate.id > original.id
+        """
+    )
+    op.drop_index("ix_game_game_id", table_name="game")
+    op.create_index(op.f("ix_game_game_id"), "game", ["game_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_game_game_id"), table_name="game")
+    op.create_index("ix_game_game_id", "game", ["game_id"], unique=False)
@@ -0,0 +1,39 @@
+"""move eval best move gap
+
+Revision ID: d3b7f1a0c586
+Revises: a6d3f9c2e514
+Create Date: 2026-10-18 23:02:51.417380
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d3b7f1a0c586"
+down_revision: Union[str, None] = "a6d3f9c2e514"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("move_eval", sa.Column("best_move_gap", sa.Integer(), nullable=True))
+    # Multipv rows stored the gap in eval_diff and were categorized by it;
+    # keep it and analyze those games again so that eval_diff and category
+    # mean the same as in other profiles
+    op.execute("UPDATE move_eval SET best_move_gap = eval_diff WHERE best_move IS NOT NULL")
+    op.execute(
+        """
+        UPDATE analysis_job
+        SET status = 'pending', attempts = 0, updated_at = now() AT TIME ZONE 'UTC'
+        WHERE status = 'done'
+          AND game_id IN (SELECT game_id FROM move_eval WHERE best_move IS NOT NULL)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("move_eval", "best_move_gap")
@@ -0,0 +1,39 @@
+"""game accuracy columns
+
+Revision ID: d5a9e3f17b20
+Revises: b81d4f2a6c93
+Create Date: 2026-10-18 14:57:44.018362
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a9e3f17b20"
+down_revision: Union[str, None] = "b81d4f2a6c93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("game", sa.Column("white_accuracy", sa.Float(), nullable=True))
+    op.add_column("game", sa.Column("black_accuracy", sa.Float(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE game
+        SET white_accuracy = (analysis_result::json ->> 'white')::float,
+            black_accuracy = (analysis_result::json ->> 'black')::float
+        WHERE analysis_result IS NOT NULL
+          AND analysis_result NOT IN ('', '{}', 'null')
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("game", "black_accuracy")
+    op.drop_column("game", "white_accuracy")
@@ -0,0 +1,49 @@
+"""eco opening cache
+
+Revision ID: e1a7c3f95b08
+Revises: c58f0e2b9d41
+Create Date: 2026-10-18 11:48:05.913377
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e1a7c3f95b08"
+down_revision: Union[str, None] = "c58f0e2b9d41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "eco_opening",
+        sa.Column("url", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("fetched_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("url"),
+    )
+
+    # Seed the cache with the names already resolved for stored games
+    game_columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("game")}
+    if "eco_name" not in game_columns:
+        return
+
+    op.execute(
+        """
+        INSERT INTO eco_opening (url, name, fetched_at)
+        SELECT DISTINCT ON (eco) eco, eco_name, now() AT TIME ZONE 'UTC'
+        FROM game
+        WHERE eco IS NOT NULL AND eco_name IS NOT NULL AND eco_name <> 'Unknown'
+        ORDER BY eco, id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("eco_opening")
@@ -0,0 +1,112 @@
+"""player stats weekly
+
+Revision ID: f2c6a8d40e19
+Revises: d5a9e3f17b20
+Create Date: 2026-10-18 15:40:12.734501
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c6a8d40e19"
+down_revision: Union[str, None] = "d5a9e3f17b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "player_stats_weekly",
+        sa.Column("player_id", sa.Integer(), nullable=False),
+        sa.Column("week", sa.DateTime(), nullable=False),
+        sa.Column("time_control", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("games", sa.Integer(), nullable=False),
+        sa.Column("wins", sa.Integer(), nullable=False),
+        sa.Column("losses", sa.Integer(), nullable=False),
+        sa.Column("draws", sa.Integer(), nullable=False),
+        sa.Column("white_games", sa.Integer(), nullable=False),
+        sa.Column("rating_sum", sa.Integer(), nullable=False),
+        sa.Column("accuracy_games", sa.Integer(), nullable=False),
+        sa.Column("accuracy_sum", sa.Float(), nullable=False),
+        sa.Column("analyzed_moves", sa.Integer(), nullable=False),
+        sa.Column("eval_diff_sum", sa.Integer(), nullable=False),
+        sa.Column("blunders", sa.Integer(), nullable=False),
+        sa.Column("mistakes", sa.Integer(), nullable=False),
+        sa.Column("dubious_moves", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+        ),
+        sa.PrimaryKeyConstraint("player_id", "week", "time_control"),
+    )
+
+    # Same aggregation as chess_pgn_analyzer_api.stats.weekly_stats_query,
+    # for every player at once
+    op.execute(
+        """
+        WITH player_game AS (
+            SELECT game.*,
+                   lower(game.white_username) = lower(player.username) AS is_white
+            FROM game
+            JOIN player ON player.id = game.player_id
+        ),
+        player_move AS (
+            SELECT move_eval.game_id,
+                   count(*) AS moves,
+                   sum(move_eval.eval_diff) AS eval_diff_sum,
+                   count(*) FILTER (WHERE move_eval.category = '??') AS blunders,
+                   count(*) FILTER (WHERE move_eval.category = '?') AS mistakes,
+                   count(*) FILTER (WHERE move_eval.category = '?!') AS dubious_moves
+            FROM move_eval
+            JOIN player_game ON player_game.id = move_eval.game_id
+            WHERE move_eval.side = CASE WHEN player_game.is_white THEN 'white' ELSE 'black' END
+            GROUP BY move_eval.game_id
+        ),
+        outcome AS (
+            SELECT player_game.*,
+                   CASE
+                       WHEN CASE WHEN is_white THEN white_result ELSE black_result END = 'win'
+                           THEN 'win'
+                       WHEN CASE WHEN is_white THEN black_result ELSE white_result END = 'win'
+                           THEN 'loss'
+                       ELSE 'draw'
+                   END AS outcome
+            FROM player_game
+        )
+        INSERT INTO player_stats_weekly
+            (player_id, week, time_control, games, wins, losses, draws, white_games,
+             rating_sum, accuracy_games, accuracy_sum, analyzed_moves, eval_diff_sum,
+             blunders, mistakes, dubious_moves, updated_at)
+        SELECT outcome.player_id,
+               date_trunc('week', outcome.end_time),
+               outcome.time_control,
+               count(*),
+               count(*) FILTER (WHERE outcome.outcome = 'win'),
+               count(*) FILTER (WHERE outcome.outcome = 'loss'),
+               count(*) FILTER (WHERE outcome.outcome = 'draw'),
+               count(*) FILTER (WHERE outcome.is_white),
+               sum(CASE WHEN outcome.is_white THEN white_rating ELSE black_rating END),
+               count(CASE WHEN outcome.is_white THEN white_accuracy ELSE black_accuracy END),
+               coalesce(sum(CASE WHEN outcome.is_white THEN white_accuracy ELSE black_accuracy END), 0),
+               coalesce(sum(player_move.moves), 0),
+               coalesce(sum(player_move.eval_diff_sum), 0),
+               coalesce(sum(player_move.blunders), 0),
+               coalesce(sum(player_move.mistakes), 0),
+               coalesce(sum(player_move.dubious_moves), 0),
+               now() AT TIME ZONE 'UTC'
+        FROM outcome
+        LEFT JOIN player_move ON player_move.game_id = outcome.id
+        GROUP BY outcome.player_id, date_trunc('week', outcome.end_time), outcome.time_control
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("player_stats_weekly")
@@ -0,0 +1,42 @@
+from .engine import AnalysisEngine, find_stockfish_path
+from .engine_pool import (
+    EnginePool,
+    get_engine_pool,
+    close_engine_pool,
+    init_worker_process,
+    ENGINE_POOL_SIZE,
+)
+from .eval_cache import EvalCache, get_eval_cache
+from .opening_book import find_book_path, get_opening_book
+from .profiles import ANALYSIS_PROFILES, DEFAULT_ANALYSIS_PROFILE, get_analysis_profile
+from .evaluation import (
+    analyze_game_moves,
+    analyze_moves,
+    analyze_game_pgn,
+    analyze_packed_game,
+    categorize_move,
+    run_analysis,
+)
+
+__all__ = [
+    "AnalysisEngine",
+    "find_stockfish_path",
+    "EnginePool",
+    "get_engine_pool",
+    "close_engine_pool",
+    "init_worker_process",
+    "ENGINE_POOL_SIZE",
+    "EvalCache",
+    "get_eval_cache",
+    "find_book_path",
+    "get_opening_book",
+    "ANALYSIS_PROFILES",
+    "DEFAULT_ANALYSIS_PROFILE",
+    "get_analysis_profile",
+    "analyze_game_moves",
+    "analyze_moves",
+    "analyze_game_pgn",
+    "analyze_packed_game",
+    "categorize_move",
+    "run_analysis",
+]
@@ -0,0 +1,119 @@
+from typing import Optional
+import chess
+import chess.engine
+import os
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENGINE_DEPTH = int(os.getenv("ENGINE_DEPTH", "12"))
+ENGINE_THREADS = int(os.getenv("ENGINE_THREADS", "1"))
+ENGINE_HASH_MB = int(os.getenv("ENGINE_HASH_MB", "64"))
+
+# Engine errors after which a pooled engine must not be reused
+ENGINE_FAILURES = (chess.engine.EngineError, chess.engine.EngineTerminatedError, OSError)
+
+
+def find_stockfish_path() -> str:
+    # Get Stockfish path from environment variable or find it in PATH
+    stockfish_path = os.getenv("STOCKFISH_PATH") or shutil.which("stockfish")
+    if not stockfish_path:
+        logger.error("Stockfish executable not found")
+        raise RuntimeError("Stockfish not found")
+
+    # Check if Stockfish is executable
+    if not os.access(stockfish_path, os.X_OK):
+        logger.error(f"Stockfish at {stockfish_path} is not executable")
+        raise RuntimeError("Stockfish is not executable")
+
+    return stockfish_path
+
+
+def score_to_evaluation(score: chess.engine.PovScore) -> dict:
+    # Same shape as stockfish.Stockfish.get_evaluation(): positive values
+    # favour white regardless of the side to move.
+    white_score = score.white()
+    if white_score.is_mate():
+        return {"type": "mate", "value": white_score.mate()}
+    return {"type": "cp", "value": white_score.score()}
+
+
+class AnalysisEngine:
+    """Stockfish process driven directly over UCI via python-chess.
+
+    Every position is sent as ``position fen ...`` followed by ``go depth N``,
+    so the cost of an evaluation does not grow with the length of the game.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        depth: int = ENGINE_DEPTH,
+        options: Optional[dict] = None,
+    ):
+        self.depth = depth
+        self._engine = chess.engine.SimpleEngine.popen_uci(path)
+        # e.g. "Stockfish 16.1"; evaluations are only shared between engines
+        # with the same name
+        self.name = self._engine.id.get("name", os.path.basename(path))
+        # Running totals over the engine's lifetime
+        self.searches = 0
+        self.nodes = 0
+        if options is None:
+            options = {
+                "Threads": ENGINE_THREADS,
+                "Hash": ENGINE_HASH_MB,
+                "Minimum Thinking Time": 20,
+            }
+        # Older and newer Stockfish releases expose different option sets
+        self._engine.configure(
+            {name: value for name, value in options.items() if name in self._engine.options}
+        )
+        self._game = object()
+
+    def new_game(self) -> None:
+        # python-chess sends "ucinewgame" whenever the game token changes
+        self._game = object()
+
+    def is_alive(self) -> bool:
+        try:
+            self._engine.ping()
+            return True
+        except ENGINE_FAILURES:
+            return False
+
+    def close(self) -> None:
+        try:
+            self._engine.quit()
+        except Exception as e:
+            logger.warning(f"Error stopping Stockfish: {str(e)}")
+            self._engine.close()
+
+    def evaluate(self, board: chess.Board, depth: Optional[int] = None) -> dict:
+        info = self._engine.analyse(
+            # Dropping the move stack makes python-chess send a bare FEN
+            # instead of replaying the whole game from the start position.
+            board.copy(stack=False),
+            chess.engine.Limit(depth=depth or self.depth),
+            game=self._game,
+        )
+        self.searches += 1
+        self.nodes += info.get("nodes", 0)
+        return score_to_evaluation(info["score"])
+
+    def candidates(self, board: chess.Board, multipv: int, depth: Optional[int] = None) -> list:
+        # The engine's best moves with their evaluations, best first
+        infos = self._engine.analyse(
+            board.copy(stack=False),
+            chess.engine.Limit(depth=depth or self.depth),
+            multipv=multipv,
+            game=self._game,
+        )
+        self.searches += 1
+        self.nodes += infos[0].get("nodes", 0) if infos else 0
+        return [
+            (info["pv"][0], score_to_evaluation(info["score"]))
+            for info in infos
+            if info.get("pv") and "score" in info
+        ]
@@ -0,0 +1,127 @@
+from .engine import AnalysisEngine, ENGINE_FAILURES, ENGINE_THREADS, find_stockfish_path
+from ..logging_config import configure_logging
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+import multiprocessing.util
+import os
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each pooled engine gets ENGINE_THREADS search threads; the pool is sized so
+# that pool_size * ENGINE_THREADS does not exceed the number of cores.
+ENGINE_POOL_SIZE = int(
+    os.getenv("ENGINE_POOL_SIZE", max(1, (os.cpu_count() or 1) // ENGINE_THREADS))
+)
+
+
+class EnginePool:
+    """Bounded pool of long-lived engine processes.
+
+    Engines are started lazily on first checkout and reused afterwards. An
+    engine that died or raised while checked out is discarded and its slot is
+    refilled with a fresh process on the next checkout.
+    """
+
+    def __init__(self, factory: Callable[[], AnalysisEngine], size: int = ENGINE_POOL_SIZE):
+        self.size = size
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._engines: set = set()
+        # Counters of discarded engines, so totals() never goes backwards
+        self._retired_searches = 0
+        self._retired_nodes = 0
+        # None marks a free slot whose engine has not been started yet
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(None)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[AnalysisEngine]:
+        engine = self._idle.get(timeout=timeout)
+        try:
+            if engine is not None and not engine.is_alive():
+                logger.warning("Discarding crashed engine from pool")
+                self._discard(engine)
+                engine = None
+            if engine is None:
+                engine = self._factory()
+                with self._lock:
+                    self._engines.add(engine)
+            # Sends "ucinewgame" before the first search of the next game
+            engine.new_game()
+        except Exception:
+            if engine is not None:
+                self._discard(engine)
+            self._idle.put(None)
+            raise
+
+        try:
+            yield engine
+        except ENGINE_FAILURES:
+            logger.warning("Engine failed during analysis, replacing it")
+            self._discard(engine)
+            self._idle.put(None)
+            raise
+        except BaseException:
+            self._idle.put(engine)
+            raise
+        else:
+            self._idle.put(engine)
+
+    def totals(self) -> tuple:
+        # (searches, nodes) over every engine the pool has run, for per-game deltas
+        with self._lock:
+            return (
+                self._retired_searches + sum(engine.searches for engine in self._engines),
+                self._retired_nodes + sum(engine.nodes for engine in self._engines),
+            )
+
+    def _discard(self, engine: AnalysisEngine) -> None:
+        with self._lock:
+            if engine in self._engines:
+                self._engines.discard(engine)
+                self._retired_searches += engine.searches
+                self._retired_nodes += engine.nodes
+        engine.close()
+
+    def close(self) -> None:
+        with self._lock:
+            engines, self._engines = self._engines, set()
+        for engine in engines:
+            engine.close()
+
+
+_pool: Optional[EnginePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_engine_pool() -> EnginePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            stockfish_path = find_stockfish_path()
+            logger.info(
+                f"Starting engine pool: {ENGINE_POOL_SIZE} x Stockfish "
+                f"({ENGINE_THREADS} thread(s)) at {stockfish_path}"
+            )
+            _pool = EnginePool(lambda: AnalysisEngine(stockfish_path))
+        return _pool
+
+
+def close_engine_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def init_worker_process() -> None:
+    # Spawned processes start without the parent's logging setup
+    configure_logging()
+    # python-chess runs each engine on a non-daemon thread, so the pool must be
+    # closed before a worker process joins its threads on exit.
+    multiprocessing.util.Finalize(None, close_engine_pool, exitpriority=10)
@@ -0,0 +1,147 @@
+from ..models.position_eval import PositionEval
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Optional
+import chess
+import chess.polyglot
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Positions kept in memory by each analysis process
+EVAL_CACHE_SIZE = int(os.getenv("EVAL_CACHE_SIZE", "200000"))
+# Share evaluations between processes and runs through the position_eval table
+EVAL_CACHE_DB = os.getenv("EVAL_CACHE_DB", "true").lower() in ("1", "true", "yes")
+
+
+def position_key(board: chess.Board) -> int:
+    # Polyglot Zobrist hash, made signed to fit a Postgres bigint
+    key = chess.polyglot.zobrist_hash(board)
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def row_to_evaluation(eval_cp: Optional[int], mate: Optional[int]) -> dict:
+    if mate is not None:
+        return {"type": "mate", "value": mate}
+    return {"type": "cp", "value": eval_cp}
+
+
+class EvalCache:
+    """Engine evaluations by position, depth and engine.
+
+    An in-process LRU sits in front of the position_eval table. Analysis runs
+    in synchronous worker processes, so the table is read and written through
+    psycopg2, with one query per game for lookups and one for inserts. A
+    failing database only costs the cache, never the analysis.
+    """
+
+    def __init__(self, maxsize: int = EVAL_CACHE_SIZE, persist: bool = EVAL_CACHE_DB):
+        self.maxsize = maxsize
+        self._cache: OrderedDict = OrderedDict()
+        self._db = None
+        if persist:
+            # Only the persistent cache needs the database settings
+            from ..database import DATABASE_URL
+
+            url = make_url(DATABASE_URL).set(drivername="postgresql+psycopg2")
+            self._db = create_engine(url, pool_size=1, max_overflow=0, pool_pre_ping=True)
+
+    def _cache_get(self, key: tuple):
+        evaluation = self._cache.get(key)
+        if evaluation is not None:
+            self._cache.move_to_end(key)
+        return evaluation
+
+    def _cache_put(self, key: tuple, evaluation):
+        self._cache[key] = evaluation
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def get_many(self, positions: set, depth: int, engine: str) -> dict:
+        evaluations = {}
+        for position in positions:
+            evaluation = self._cache_get((position, depth, engine))
+            if evaluation is not None:
+                evaluations[position] = evaluation
+
+        missing = positions - evaluations.keys()
+        if missing and self._db is not None:
+            try:
+                with self._db.connect() as connection:
+                    rows = connection.execute(
+                        select(PositionEval.zobrist, PositionEval.eval_cp, PositionEval.mate)
+                        .where(
+                            PositionEval.zobrist.in_(list(missing)),
+                            PositionEval.depth == depth,
+                            PositionEval.engine == engine,
+                        )
+                    ).all()
+            except SQLAlchemyError as e:
+                logger.warning(f"Error reading position evaluations: {str(e)}")
+                rows = []
+            for position, eval_cp, mate in rows:
+                evaluations[position] = row_to_evaluation(eval_cp, mate)
+                self._cache_put((position, depth, engine), evaluations[position])
+
+        return evaluations
+
+    # MultiPV candidate lists are only kept in memory; position_eval holds a
+    # single evaluation per position
+    def get_candidates(
+        self, position: int, depth: int, engine: str, multipv: int
+    ) -> Optional[list]:
+        return self._cache_get((position, depth, engine, "multipv", multipv))
+
+    def put_candidates(
+        self, position: int, depth: int, engine: str, multipv: int, candidates: list
+    ):
+        self._cache_put((position, depth, engine, "multipv", multipv), candidates)
+
+    def put_many(self, evaluations: dict, depth: int, engine: str):
+        for position, evaluation in evaluations.items():
+            self._cache_put((position, depth, engine), evaluation)
+
+        if not evaluations or self._db is None:
+            return
+        created_at = datetime.utcnow()
+        rows = [
+            {
+                "zobrist": position,
+                "depth": depth,
+                "engine": engine,
+                "eval_cp": evaluation["value"] if evaluation["type"] == "cp" else None,
+                "mate": evaluation["value"] if evaluation["type"] == "mate" else None,
+                "created_at": created_at,
+            }
+            for position, evaluation in evaluations.items()
+        ]
+        try:
+            with self._db.begin() as connection:
+                connection.execute(
+                    insert(PositionEval).on_conflict_do_nothing(
+                        index_elements=["zobrist", "depth", "engine"]
+                    ),
+                    rows,
+                )
+        except SQLAlchemyError as e:
+            logger.warning(f"Error storing position evaluations: {str(e)}")
+
+
+_cache: Optional[EvalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_eval_cache() -> EvalCache:
+    # One per process: the psycopg2 connection must not cross a fork
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EvalCache()
+        return _cache
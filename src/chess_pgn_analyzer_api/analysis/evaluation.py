@@ -0,0 +1,438 @@
+from .engine import AnalysisEngine
+from .engine_pool import get_engine_pool
+from .eval_cache import EvalCache, get_eval_cache, position_key
+from .opening_book import book_plies, get_opening_book
+from .profiles import DEFAULT_ANALYSIS_PROFILE, get_analysis_profile
+from ..logging_config import MOVE_LOG_SAMPLE_RATE, SampleFilter
+from ..move_codec import decode_moves
+from itertools import islice
+from typing import Callable, Optional
+import chess
+import chess.pgn
+import chess.polyglot
+import io
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+# Per-move events; only a sample of them is logged
+move_logger = logging.getLogger(f"{__name__}.moves")
+move_logger.addFilter(SampleFilter(MOVE_LOG_SAMPLE_RATE))
+
+
+def categorize_move(evaluation_diff):
+    if evaluation_diff <= -300:
+        return "??"  # Blunder
+    elif evaluation_diff <= -150:
+        return "?"  # Mistake
+    elif evaluation_diff <= -75:
+        return "?!"  # Dubious Move
+    elif evaluation_diff < -30:
+        return "∓"  # Slight disadvantage
+    elif evaluation_diff < 30:
+        return "="  # Equal position
+    elif evaluation_diff < 75:
+        return "⩲"  # Slight advantage
+    elif evaluation_diff < 150:
+        return "±"  # Clear advantage
+    elif evaluation_diff < 300:
+        return "+"  # Winning advantage
+    else:
+        return "++"  # Decisive advantage
+
+
+def evaluation_diff(prev_evaluation: dict, current_evaluation: dict, turn: chess.Color) -> int:
+    # Handle mate scores
+    if prev_evaluation["type"] == "mate" and current_evaluation["type"] == "mate":
+        return (prev_evaluation["value"] - current_evaluation["value"]) * 100
+    elif prev_evaluation["type"] == "mate":
+        return 10000 if prev_evaluation["value"] > 0 else -10000
+    elif current_evaluation["type"] == "mate":
+        return -10000 if current_evaluation["value"] > 0 else 10000
+    else:
+        return (current_evaluation["value"] - prev_evaluation["value"]) * (
+            -1 if turn == chess.BLACK else 1
+        )
+
+
+# Category of moves played from the opening book, which are not searched
+BOOK_CATEGORY = "book"
+
+MATE_SCORE = 10000
+
+
+def analyze_game_moves(
+    engine: AnalysisEngine,
+    game_pgn: str,
+    cache: Optional[EvalCache] = None,
+    book: Optional[chess.polyglot.MemoryMappedReader] = None,
+    profile: Optional[dict] = None,
+) -> list:
+    chess_game = chess.pgn.read_game(io.StringIO(game_pgn))
+    return analyze_moves(
+        engine, chess_game.board(), chess_game.mainline_moves(), cache, book, profile
+    )
+
+
+def terminal_evaluation(board: chess.Board) -> Optional[dict]:
+    if board.is_checkmate():
+        return {"type": "mate", "value": 0}
+    if board.is_stalemate() or board.is_insufficient_material():
+        return {"type": "cp", "value": 0}
+    return None
+
+
+def has_single_move(board: chess.Board) -> bool:
+    return len(list(islice(board.legal_moves, 2))) == 1
+
+
+def search_positions(
+    engine: AnalysisEngine,
+    positions: list,
+    indices: list,
+    depth: int,
+    cache: Optional[EvalCache] = None,
+    node_limit: Optional[int] = None,
+) -> dict:
+    """Evaluates positions[i] for each index at the given depth.
+
+    Positions found in the cache are not searched, and a position repeated
+    within the game is searched once. Searching stops early once the
+    engine's node counter reaches node_limit.
+    """
+    # Chess960 castling rights are not part of the Polyglot hash
+    keys = {}
+    if cache is not None and not positions[0].chess960:
+        keys = {index: position_key(positions[index]) for index in indices}
+    cached = cache.get_many(set(keys.values()), depth, engine.name) if keys else {}
+
+    evaluations = {}
+    searched = {}
+    for index in indices:
+        key = keys.get(index)
+        if key in cached:
+            evaluations[index] = cached[key]
+        elif key is not None and key in searched:
+            evaluations[index] = searched[key]
+        elif node_limit is None or engine.nodes < node_limit:
+            evaluations[index] = engine.evaluate(positions[index], depth)
+            if key is not None:
+                searched[key] = evaluations[index]
+    if searched:
+        cache.put_many(searched, depth, engine.name)
+
+    if keys:
+        logger.info(
+            f"{len(cached)} of {len(keys)} positions at depth {depth} from the evaluation cache"
+        )
+    return evaluations
+
+
+def evaluate_positions(
+    engine: AnalysisEngine,
+    positions: list,
+    cache: Optional[EvalCache] = None,
+    profile: Optional[dict] = None,
+) -> list:
+    profile = profile or get_analysis_profile()
+    depth, deep_depth = profile["depth"], profile["deep_depth"]
+    count = len(positions)
+    evaluations = [None] * count
+    depths = [0] * count
+
+    # Finished positions are never searched. With skip_forced, neither is a
+    # position with a single legal move: it takes the evaluation of the
+    # position after it.
+    forced = [
+        profile["skip_forced"] and index < count - 1 and has_single_move(positions[index])
+        for index in range(count)
+    ]
+    unforced = list(range(count))
+    for index in reversed(range(count - 1)):
+        if forced[index]:
+            unforced[index] = unforced[index + 1]
+
+    searchable = []
+    for index, position in enumerate(positions):
+        terminal = terminal_evaluation(position)
+        if terminal is not None:
+            evaluations[index], depths[index] = terminal, deep_depth
+        elif not forced[index]:
+            searchable.append(index)
+
+    def update(results: dict, results_depth: int):
+        for index, evaluation in results.items():
+            evaluations[index], depths[index] = evaluation, results_depth
+        for index in range(count):
+            if forced[index]:
+                evaluations[index] = evaluations[unforced[index]]
+                depths[index] = depths[unforced[index]]
+
+    if deep_depth > depth and cache is not None:
+        # Positions already known at full depth skip the shallow search too;
+        # a node limit of 0 only reads the cache
+        cached = search_positions(engine, positions, searchable, deep_depth, cache, node_limit=0)
+        update(cached, deep_depth)
+        searchable = [index for index in searchable if index not in cached]
+    update(search_positions(engine, positions, searchable, depth, cache), depth)
+
+    # The node budget limits the deepening passes only, not the search above
+    deepen_nodes = profile["deepen_max_nodes"]
+    node_limit = None if deepen_nodes is None else engine.nodes + deepen_nodes
+    while deep_depth > depth and (node_limit is None or engine.nodes < node_limit):
+        swings = set()
+        for index in range(1, count):
+            if min(depths[index - 1], depths[index]) >= deep_depth:
+                continue
+            diff = evaluation_diff(evaluations[index - 1], evaluations[index], positions[index].turn)
+            if abs(diff) >= profile["swing_cp"]:
+                swings.update(
+                    unforced[swing] for swing in (index - 1, index) if depths[swing] < deep_depth
+                )
+        if not swings:
+            break
+        deepened = search_positions(
+            engine, positions, sorted(swings), deep_depth, cache, node_limit
+        )
+        if not deepened:
+            break
+        update(deepened, deep_depth)
+
+    return evaluations
+
+
+def mover_score(evaluation: dict, mover: chess.Color) -> int:
+    # Centipawns from the point of view of the side that just moved, with
+    # mates scored above any material balance
+    value = evaluation["value"]
+    if evaluation["type"] == "mate":
+        if value == 0:
+            return MATE_SCORE  # only a mating move leads to a mated position
+        distance = min(abs(value), 50) * 100
+        value = MATE_SCORE - distance if value > 0 else distance - MATE_SCORE
+    return value if mover == chess.WHITE else -value
+
+
+def best_move_gap(best: dict, played: dict, mover: chess.Color) -> int:
+    # A move cannot beat the best move; a positive gap is search noise
+    return min(0, mover_score(played, mover) - mover_score(best, mover))
+
+
+def search_candidates(
+    engine: AnalysisEngine,
+    positions: list,
+    indices: list,
+    multipv: int,
+    depth: int,
+    cache: Optional[EvalCache] = None,
+) -> dict:
+    # Candidate lists of positions[i] for each index, from the in-memory cache
+    # where possible
+    candidates = {}
+    for index in indices:
+        key = None
+        if cache is not None and not positions[0].chess960:
+            key = position_key(positions[index])
+            candidates[index] = cache.get_candidates(key, depth, engine.name, multipv)
+        if candidates.get(index) is None:
+            candidates[index] = engine.candidates(positions[index], multipv, depth)
+            if key is not None:
+                cache.put_candidates(key, depth, engine.name, multipv, candidates[index])
+    return candidates
+
+
+def grade_with_candidates(
+    engine: AnalysisEngine,
+    positions: list,
+    moves: list,
+    profile: dict,
+    cache: Optional[EvalCache] = None,
+) -> list:
+    """Returns (evaluation after the move, eval diff, best move, gap to the
+    best move) for each move.
+
+    One MultiPV search per position gives the best move and its evaluation
+    and, when the played move is among the candidates, the played move's
+    evaluation too. Otherwise the search of the position the move leads to
+    supplies it, so each position is still searched only once. The eval diff
+    is the swing from the best move's evaluation and grades the move like in
+    the other profiles; the gap is kept alongside it.
+    """
+    depth, multipv = profile["depth"], profile["multipv"]
+    count = len(moves)
+    # Forced moves need no search, like in evaluate_positions
+    candidates = search_candidates(
+        engine,
+        positions,
+        [
+            index for index in range(count)
+            if not (profile["skip_forced"] and has_single_move(positions[index]))
+        ],
+        multipv,
+        depth,
+        cache,
+    )
+
+    after = [None] * count
+    for index in reversed(range(count)):
+        after[index] = dict(candidates.get(index, [])).get(moves[index])
+        if after[index] is not None:
+            continue
+        if index + 1 == count:
+            after[index] = terminal_evaluation(positions[count]) or search_positions(
+                engine, positions, [count], depth, cache
+            )[count]
+        elif candidates.get(index + 1):
+            after[index] = candidates[index + 1][0][1]
+        else:
+            after[index] = after[index + 1]
+
+    graded = []
+    for index in range(count):
+        if candidates.get(index):
+            best_move, best_evaluation = candidates[index][0]
+            gap = best_move_gap(best_evaluation, after[index], positions[index].turn)
+            diff = evaluation_diff(best_evaluation, after[index], positions[index + 1].turn)
+            graded.append((after[index], diff, best_move, gap))
+        else:
+            best_move = moves[index] if index not in candidates else None
+            graded.append((after[index], 0, best_move, 0))
+    return graded
+
+
+def analyze_moves(
+    engine: AnalysisEngine,
+    board: chess.Board,
+    moves,
+    cache: Optional[EvalCache] = None,
+    book: Optional[chess.polyglot.MemoryMappedReader] = None,
+    profile: Optional[dict] = None,
+) -> list:
+    profile = profile or get_analysis_profile()
+    move_analysis = []
+
+    moves = list(moves)
+    positions = [board.copy(stack=False)]
+    for move in moves:
+        board.push(move)
+        positions.append(board.copy(stack=False))
+
+    # Search starts at the first position out of the book
+    in_book = book_plies(book, positions, moves) if book is not None else 0
+    logger.info(f"{in_book} of {len(moves)} moves from the opening book")
+
+    searched_positions = positions[in_book:]
+    if profile["multipv"]:
+        graded = grade_with_candidates(
+            engine, searched_positions, moves[in_book:], profile, cache
+        )
+    else:
+        # Each position is searched at most once: the evaluation after move N
+        # is reused as the "before" evaluation of move N + 1, and positions
+        # already in the cache are not searched at all.
+        evaluations = evaluate_positions(engine, searched_positions, cache, profile)
+        graded = [
+            (
+                evaluations[index],
+                evaluation_diff(
+                    evaluations[index - 1], evaluations[index], searched_positions[index].turn
+                ),
+                None,
+                None,
+            )
+            for index in range(1, len(searched_positions))
+        ]
+    graded = [None] * in_book + graded
+
+    for move_number, move in enumerate(moves, start=1):
+        side = "white" if positions[move_number - 1].turn == chess.WHITE else "black"
+        if move_number <= in_book:
+            move_analysis.append({
+                "move": move.uci(),
+                "side": side,
+                "eval_cp": None,
+                "mate": None,
+                "eval_diff": 0,
+                "category": BOOK_CATEGORY,
+                "best_move": None,
+                "best_move_gap": None,
+            })
+            continue
+
+        current_evaluation, eval_diff, best_move, gap = graded[move_number - 1]
+        move_category = categorize_move(eval_diff)
+        move_analysis.append({
+            "move": move.uci(),
+            "side": side,
+            "eval_cp": current_evaluation["value"] if current_evaluation["type"] == "cp" else None,
+            "mate": current_evaluation["value"] if current_evaluation["type"] == "mate" else None,
+            "eval_diff": eval_diff,
+            "category": move_category,
+            "best_move": best_move.uci() if best_move else None,
+            "best_move_gap": gap,
+        })
+
+        # Lazy arguments: the message is only built for the sampled records
+        move_logger.info(
+            "Move %d: %s - Category: %s, Eval diff: %d",
+            move_number,
+            move,
+            move_category,
+            eval_diff,
+            extra={"ply": move_number, "category": move_category, "eval_diff": eval_diff},
+        )
+
+    logger.info(f"Completed analysis of {len(move_analysis)} moves")
+    return move_analysis
+
+
+def start_board(initial_fen: Optional[str], rules: Optional[str]) -> chess.Board:
+    return chess.Board(initial_fen or chess.STARTING_FEN, chess960=rules == "chess960")
+
+
+def analyze_packed_game(
+    moves: bytes,
+    initial_fen: Optional[str],
+    rules: Optional[str],
+    profile: str = DEFAULT_ANALYSIS_PROFILE,
+) -> list:
+    # Entry point for games parsed at ingest: replays the packed moves and
+    # skips PGN parsing entirely.
+    with get_engine_pool().checkout() as engine:
+        return analyze_moves(
+            engine,
+            start_board(initial_fen, rules),
+            decode_moves(moves),
+            get_eval_cache(),
+            get_opening_book(),
+            get_analysis_profile(profile),
+        )
+
+
+def analyze_game_pgn(game_pgn: str, profile: str = DEFAULT_ANALYSIS_PROFILE) -> list:
+    # Entry point for analysis worker processes: checks out an engine from the
+    # process-local pool for the duration of one game.
+    with get_engine_pool().checkout() as engine:
+        return analyze_game_moves(
+            engine,
+            game_pgn,
+            get_eval_cache(),
+            get_opening_book(),
+            get_analysis_profile(profile),
+        )
+
+
+def run_analysis(submitted_at: float, analyze: Callable, *args) -> tuple:
+    # Runs in an analysis process. Metrics are recorded by the parent, so the
+    # time spent waiting for this process and the engine work are returned
+    # alongside the analysis.
+    started_at = time.time()
+    searches, nodes = get_engine_pool().totals()
+    move_analysis = analyze(*args)
+    total_searches, total_nodes = get_engine_pool().totals()
+    return move_analysis, {
+        "wait_seconds": started_at - submitted_at,
+        "seconds": time.time() - started_at,
+        "searches": total_searches - searches,
+        "nodes": total_nodes - nodes,
+    }
@@ -0,0 +1,57 @@
+from typing import Optional
+import chess
+import chess.polyglot
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Book entries with a lower weight are not treated as theory; Polyglot books
+# use weight 0 for moves that should never be played.
+BOOK_MIN_WEIGHT = int(os.getenv("BOOK_MIN_WEIGHT", "1"))
+
+
+def find_book_path() -> Optional[str]:
+    # Polyglot opening book; analysis runs without one when BOOK_PATH is unset
+    book_path = os.getenv("BOOK_PATH")
+    if not book_path:
+        return None
+
+    if not os.path.isfile(book_path):
+        logger.error(f"Opening book not found at {book_path}")
+        raise RuntimeError("Opening book not found")
+
+    return book_path
+
+
+def book_plies(
+    book: chess.polyglot.MemoryMappedReader, positions: list, moves: list
+) -> int:
+    # Number of leading moves of a game that are in the book
+    plies = 0
+    for position, move in zip(positions, moves):
+        if position.chess960 or not any(
+            entry.move == move
+            for entry in book.find_all(position, minimum_weight=BOOK_MIN_WEIGHT)
+        ):
+            break
+        plies += 1
+    return plies
+
+
+_book: Optional[chess.polyglot.MemoryMappedReader] = None
+_book_loaded = False
+_book_lock = threading.Lock()
+
+
+def get_opening_book() -> Optional[chess.polyglot.MemoryMappedReader]:
+    global _book, _book_loaded
+    with _book_lock:
+        if not _book_loaded:
+            book_path = find_book_path()
+            if book_path:
+                logger.info(f"Using opening book at {book_path}")
+                _book = chess.polyglot.open_reader(book_path)
+            _book_loaded = True
+        return _book
@@ -0,0 +1,62 @@
+from .engine import ENGINE_DEPTH
+from typing import Literal
+import os
+
+# Candidate moves kept by the multipv profile
+ANALYSIS_MULTIPV = int(os.getenv("ANALYSIS_MULTIPV", "3"))
+
+# Every position is first searched to "depth". Both positions around a move
+# whose eval swings by at least "swing_cp" are searched again to "deep_depth",
+# until no swing is left between positions of different depth or the game has
+# used "deepen_max_nodes" engine nodes on deepening. That is not a budget for
+# the whole game: the first pass always searches every position, so a game's
+# total nodes still grow with its length.
+# With "skip_forced", a position with a single legal move is not searched and
+# takes the evaluation of the position after it.
+# With "multipv" set, each position instead gets one search for its best
+# "multipv" moves, and a move is graded by how far it falls short of the best.
+ANALYSIS_PROFILES = {
+    "fast": {
+        "depth": 8,
+        "deep_depth": ENGINE_DEPTH,
+        "swing_cp": 75,
+        "deepen_max_nodes": 5_000_000,
+        "skip_forced": True,
+        "multipv": None,
+    },
+    # Every position at ENGINE_DEPTH, as before profiles existed
+    "standard": {
+        "depth": ENGINE_DEPTH,
+        "deep_depth": ENGINE_DEPTH,
+        "swing_cp": 75,
+        "deepen_max_nodes": None,
+        "skip_forced": False,
+        "multipv": None,
+    },
+    "deep": {
+        "depth": ENGINE_DEPTH,
+        "deep_depth": ENGINE_DEPTH + 6,
+        "swing_cp": 50,
+        "deepen_max_nodes": 50_000_000,
+        "skip_forced": True,
+        "multipv": None,
+    },
+    "multipv": {
+        "depth": ENGINE_DEPTH,
+        "deep_depth": ENGINE_DEPTH,
+        "swing_cp": 75,
+        "deepen_max_nodes": None,
+        "skip_forced": True,
+        "multipv": ANALYSIS_MULTIPV,
+    },
+}
+
+AnalysisProfileName = Literal["fast", "standard", "deep", "multipv"]
+
+DEFAULT_ANALYSIS_PROFILE = os.getenv("ANALYSIS_PROFILE", "standard")
+
+
+def get_analysis_profile(name: str = DEFAULT_ANALYSIS_PROFILE) -> dict:
+    if name not in ANALYSIS_PROFILES:
+        raise ValueError(f"Unknown analysis profile: {name}")
+    return ANALYSIS_PROFILES[name]
@@ -0,0 +1,111 @@
+from sqlmodel import select, func, case
+from .models.game import Game
+from .models.move_eval import MoveEval
+from .analysis.evaluation import BOOK_CATEGORY
+
+# Query builders for player analytics over the game and move_eval tables. They
+# return plain Select statements so both the async API and the synchronous
+# dashboard can run them; extra criteria on Game (date range, time control,
+# ...) are passed through.
+
+MISTAKE_CATEGORIES = {"blunders": "??", "mistakes": "?", "dubious_moves": "?!"}
+
+
+def player_side(username: str):
+    return case(
+        (func.lower(Game.white_username) == username.lower(), "white"), else_="black"
+    )
+
+
+def player_accuracy(username: str):
+    return case(
+        (func.lower(Game.white_username) == username.lower(), Game.white_accuracy),
+        else_=Game.black_accuracy,
+    )
+
+
+def player_games(player_id: int, username: str, *criteria):
+    # One row per game from the player's point of view, oldest first
+    is_white = func.lower(Game.white_username) == username.lower()
+    return (
+        select(
+            Game.end_time.label("date"),
+            player_side(username).label("player_color"),
+            player_accuracy(username).label("player_accuracy"),
+            case((is_white, Game.white_rating), else_=Game.black_rating).label("player_rating"),
+            case((is_white, Game.black_rating), else_=Game.white_rating).label("opponent_rating"),
+            Game.time_control,
+            case((is_white, Game.white_result), else_=Game.black_result).label("result"),
+            Game.moves_analyzed,
+            Game.eco,
+            Game.eco_name,
+            Game.first_move,
+            # Only games stored before PGNs were parsed at ingest need the PGN
+            case((Game.first_move.is_(None), Game.pgn)).label("pgn"),
+        )
+        .where(Game.player_id == player_id, *criteria)
+        .order_by(Game.end_time, Game.id)
+    )
+
+
+def weekly_accuracy(player_id: int, username: str, *criteria):
+    week = func.date_trunc("week", Game.end_time).label("week")
+    accuracy = player_accuracy(username)
+    return (
+        select(
+            week,
+            func.count(accuracy).label("games"),
+            func.avg(accuracy).label("avg_accuracy"),
+        )
+        .where(Game.player_id == player_id, *criteria)
+        .group_by(week)
+        .order_by(week)
+    )
+
+
+def player_moves(player_id: int, username: str, *criteria):
+    # Only the moves the player made themselves, not their opponents'
+    return (
+        select(Game.end_time, MoveEval.ply, MoveEval.uci, MoveEval.eval_diff, MoveEval.category)
+        .join(Game, Game.id == MoveEval.game_id)
+        .where(Game.player_id == player_id, MoveEval.side == player_side(username), *criteria)
+    )
+
+
+def move_category_counts(player_id: int, username: str, *criteria):
+    # Book moves are left out like in the weekly stats table
+    return (
+        select(MoveEval.category, func.count().label("moves"))
+        .join(Game, Game.id == MoveEval.game_id)
+        .where(
+            Game.player_id == player_id,
+            MoveEval.side == player_side(username),
+            MoveEval.category != BOOK_CATEGORY,
+            *criteria,
+        )
+        .group_by(MoveEval.category)
+    )
+
+
+def weekly_move_stats(player_id: int, username: str, *criteria):
+    week = func.date_trunc("week", Game.end_time).label("week")
+    return (
+        select(
+            week,
+            func.count().label("moves"),
+            func.avg(MoveEval.eval_diff).label("avg_eval_diff"),
+            *[
+                func.count().filter(MoveEval.category == category).label(label)
+                for label, category in MISTAKE_CATEGORIES.items()
+            ],
+        )
+        .join(Game, Game.id == MoveEval.game_id)
+        .where(
+            Game.player_id == player_id,
+            MoveEval.side == player_side(username),
+            MoveEval.category != BOOK_CATEGORY,
+            *criteria,
+        )
+        .group_by(week)
+        .order_by(week)
+    )
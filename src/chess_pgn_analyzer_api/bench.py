@@ -0,0 +1,403 @@
+"""Throughput benchmark over the bundled chess.com archive fixtures.
+
+    python -m src.chess_pgn_analyzer_api.bench --output bench.json
+    python -m src.chess_pgn_analyzer_api.bench --baseline bench.json
+
+The parse and analysis stages need no database. The ingest stage runs
+fetch_and_store_games against DATABASE_URL, which should be a scratch
+database: every run stores the fixture games again under a new player.
+"""
+
+from .analysis import (
+    ENGINE_POOL_SIZE,
+    AnalysisEngine,
+    EvalCache,
+    analyze_packed_game,
+    find_stockfish_path,
+    get_engine_pool,
+    get_opening_book,
+    init_worker_process,
+    run_analysis,
+)
+from .analysis.evaluation import analyze_moves, start_board
+from .analysis.profiles import ANALYSIS_PROFILES, DEFAULT_ANALYSIS_PROFILE, get_analysis_profile
+from . import chesscom
+from .chesscom import CHESSCOM_API_URL, ChessComClient
+from .ingest import game_row
+from .logging_config import configure_logging
+from .move_codec import decode_moves
+from .openings import classify_opening
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import argparse
+import asyncio
+import httpx
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+BENCH_PATH = Path(__file__).parent / "data" / "bench"
+BASELINE_PATH = BENCH_PATH / "baseline.json"
+
+STAGES = ("parse", "analysis", "worker", "ingest")
+
+# Same defaults as the analysis worker
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", ENGINE_POOL_SIZE))
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", ANALYSIS_WORKERS * 2))
+
+# Metrics where a lower value is an improvement; all others should go up
+LOWER_IS_BETTER = (
+    "seconds",
+    "engine_calls_per_game",
+    "nodes_per_game",
+    "round_trips_per_archive",
+    "avg_wait_seconds",
+    "peak_rss_mb",
+)
+# Settings of a run rather than measurements
+SETTINGS = ("games", "processes", "batch_size")
+
+
+def load_archives() -> dict:
+    # {"2024/01": [game, ...], ...} from data/bench/archive_YYYY_MM.json
+    archives = {}
+    for path in sorted(BENCH_PATH.glob("archive_*.json")):
+        _, year, month = path.stem.split("_")
+        archives[f"{year}/{month}"] = json.loads(path.read_text())["games"]
+    return archives
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds > 0 else 0.0
+
+
+def bench_parse(games: list) -> tuple:
+    # What store_archive_games does for every downloaded game
+    start = time.perf_counter()
+    rows = []
+    for game_data in games:
+        opening = classify_opening(game_data["pgn"])
+        rows.append(game_row(0, game_data, None, opening[0] if opening else None))
+    seconds = time.perf_counter() - start
+
+    positions = sum(row["ply_count"] + 1 for row in rows)
+    return rows, {
+        "games": len(rows),
+        "seconds": round(seconds, 3),
+        "games_per_sec": rate(len(rows), seconds),
+        "positions_per_sec": rate(positions, seconds),
+    }
+
+
+def bench_analysis(rows: list, profile: str, use_cache: bool) -> dict:
+    # The body of analyze_packed_game, on one engine, for every game
+    engine = AnalysisEngine(find_stockfish_path())
+    cache = EvalCache(persist=False) if use_cache else None
+    book = get_opening_book()
+    try:
+        start = time.perf_counter()
+        positions = 0
+        for row in rows:
+            engine.new_game()
+            analyze_moves(
+                engine,
+                start_board(row["initial_fen"], row["rules"]),
+                decode_moves(row["moves"]),
+                cache,
+                book,
+                get_analysis_profile(profile),
+            )
+            positions += row["ply_count"] + 1
+        seconds = time.perf_counter() - start
+        engine_name = engine.name
+        searches, nodes = engine.searches, engine.nodes
+    finally:
+        engine.close()
+
+    return {
+        "engine": engine_name,
+        "profile": profile,
+        "cache": use_cache,
+        "book": book is not None,
+        "games": len(rows),
+        "seconds": round(seconds, 3),
+        "games_per_sec": rate(len(rows), seconds),
+        "positions_per_sec": rate(positions, seconds),
+        "engine_calls_per_game": round(searches / len(rows), 2) if rows else 0,
+        "nodes_per_game": round(nodes / len(rows)) if rows else 0,
+    }
+
+
+def start_engines():
+    # Engines start lazily; the worker stage starts them before timing
+    get_engine_pool()
+    time.sleep(0.5)
+
+
+async def bench_worker(rows: list, profile: str, processes: int, batch_size: int) -> dict:
+    # The worker's analysis path without the job table: batches of packed
+    # games go through a spawned process pool to each process's EnginePool,
+    # and every batch is awaited before the next, like run_worker does
+    executor = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker_process,
+    )
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.gather(
+            *[loop.run_in_executor(executor, start_engines) for _ in range(processes)]
+        )
+        start = time.perf_counter()
+        stats = []
+        for batch_start in range(0, len(rows), batch_size):
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        executor,
+                        run_analysis,
+                        time.time(),
+                        analyze_packed_game,
+                        row["moves"],
+                        row["initial_fen"],
+                        row["rules"],
+                        profile,
+                    )
+                    for row in rows[batch_start:batch_start + batch_size]
+                ]
+            )
+            stats.extend(game_stats for _, game_stats in results)
+        seconds = time.perf_counter() - start
+    finally:
+        executor.shutdown(wait=True)
+
+    positions = sum(row["ply_count"] + 1 for row in rows)
+    return {
+        "profile": profile,
+        "processes": processes,
+        "batch_size": batch_size,
+        "games": len(rows),
+        "seconds": round(seconds, 3),
+        "games_per_sec": rate(len(rows), seconds),
+        "positions_per_sec": rate(positions, seconds),
+        "engine_calls_per_game": (
+            round(sum(game["searches"] for game in stats) / len(rows), 2) if rows else 0
+        ),
+        "nodes_per_game": round(sum(game["nodes"] for game in stats) / len(rows)) if rows else 0,
+        "avg_wait_seconds": (
+            round(sum(game["wait_seconds"] for game in stats) / len(rows), 3) if rows else 0
+        ),
+    }
+
+
+def fixture_transport(username: str, archives: dict, run: str) -> httpx.MockTransport:
+    # Serves the player, the archive list and the fixture archives the way
+    # chess.com does; game URLs get a per-run suffix so that every run
+    # inserts its games instead of hitting the existing rows
+    player_url = f"{CHESSCOM_API_URL}/player/{username}"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url == player_url:
+            return httpx.Response(200, json={
+                "username": username,
+                "player_id": int(run),
+                "status": "basic",
+                "country": f"{CHESSCOM_API_URL}/country/XX",
+                "joined": 0,
+                "last_online": 0,
+                "followers": 0,
+            })
+        if url == f"{player_url}/games/archives":
+            return httpx.Response(
+                200, json={"archives": [f"{player_url}/games/{name}" for name in archives]}
+            )
+        name = url.removeprefix(f"{player_url}/games/")
+        if name in archives:
+            games = [
+                {**game_data, "url": f"{game_data['url']}{run}"} for game_data in archives[name]
+            ]
+            return httpx.Response(200, json={"games": games})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+async def bench_ingest(archives: dict) -> dict:
+    # Imported here so that the other stages run without DATABASE_URL
+    from .database import async_session_maker, close_database, engine
+    from .routes.games import fetch_and_store_games
+    from sqlalchemy import event
+
+    run = str(int(time.time()))
+    username = f"bench_{run}"
+    chesscom._client = ChessComClient(
+        rate_limit=0, transport=fixture_transport(username, archives, run)
+    )
+
+    round_trips = 0
+
+    def count_round_trip(*args):
+        nonlocal round_trips
+        round_trips += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_round_trip)
+    try:
+        start = time.perf_counter()
+        async with async_session_maker() as session:
+            result = await fetch_and_store_games(username, session)
+        seconds = time.perf_counter() - start
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_round_trip)
+        await chesscom.close_chesscom_client()
+        await close_database()
+
+    return {
+        "archives": len(archives),
+        "games": result["total_games"],
+        "seconds": round(seconds, 3),
+        "games_per_sec": rate(result["total_games"], seconds),
+        "round_trips_per_archive": round(round_trips / len(archives), 1),
+    }
+
+
+def run_benchmarks(
+    stages: list,
+    profile: str,
+    analysis_games: int,
+    use_cache: bool,
+    processes: int = ANALYSIS_WORKERS,
+    batch_size: int = ANALYSIS_BATCH_SIZE,
+) -> dict:
+    archives = load_archives()
+    games = [game_data for archive in archives.values() for game_data in archive]
+    results = {"created_at": datetime.utcnow().isoformat(timespec="seconds"), "stages": {}}
+
+    rows, results["stages"]["parse"] = bench_parse(games)
+    if "analysis" in stages:
+        results["stages"]["analysis"] = bench_analysis(rows[:analysis_games], profile, use_cache)
+    if "worker" in stages:
+        results["stages"]["worker"] = asyncio.run(
+            bench_worker(rows[:analysis_games], profile, processes, batch_size)
+        )
+    if "ingest" in stages:
+        results["stages"]["ingest"] = asyncio.run(bench_ingest(archives))
+    if "parse" not in stages:
+        del results["stages"]["parse"]
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def flatten_metrics(results: dict) -> dict:
+    metrics = {"peak_rss_mb": results["peak_rss_mb"]}
+    for stage, stage_metrics in results["stages"].items():
+        for name, value in stage_metrics.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metrics[f"{stage}.{name}"] = value
+    return metrics
+
+
+def compare_to_baseline(results: dict, baseline: dict, max_regression: float) -> list:
+    """Prints each metric against the baseline and returns the metrics that
+    got worse by more than max_regression (a fraction)."""
+    current, previous = flatten_metrics(results), flatten_metrics(baseline)
+    regressions = []
+    for name, value in current.items():
+        if name.split(".")[-1] in SETTINGS:
+            continue
+        if not previous.get(name):
+            print(f"{name:40} {'-':>12} -> {value:>12} (not in the baseline)")
+            continue
+        change = (value - previous[name]) / previous[name]
+        worse = change if name.split(".")[-1] in LOWER_IS_BETTER else -change
+        flag = ""
+        if worse > max_regression:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:40} {previous[name]:>12} -> {value:>12} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, analysis and ingestion")
+    parser.add_argument(
+        "--stages",
+        default="parse,analysis",
+        help=f"comma-separated stages to run, from {', '.join(STAGES)}",
+    )
+    parser.add_argument(
+        "--profile", default=DEFAULT_ANALYSIS_PROFILE, choices=sorted(ANALYSIS_PROFILES)
+    )
+    parser.add_argument(
+        "--games", type=int, default=20, help="number of fixture games to analyze"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="analyze without the evaluation cache"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=ANALYSIS_WORKERS,
+        help="analysis processes of the worker stage (default ANALYSIS_WORKERS)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=ANALYSIS_BATCH_SIZE,
+        help="games per batch in the worker stage (default ANALYSIS_BATCH_SIZE)",
+    )
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        nargs="?",
+        const=BASELINE_PATH,
+        help=f"compare against a previous results file (default {BASELINE_PATH.name})",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.1,
+        help="fail when a metric is this much worse than the baseline (default 0.1)",
+    )
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(
+        stages, args.profile, args.games, not args.no_cache, args.processes, args.batch_size
+    )
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        regressions = compare_to_baseline(
+            results, json.loads(args.baseline.read_text()), args.max_regression
+        )
+        if regressions:
+            logger.error(f"Slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Inherited by the analysis processes of the worker stage too
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    configure_logging(os.environ["LOG_LEVEL"])
+    main()
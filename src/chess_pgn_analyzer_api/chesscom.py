@@ -0,0 +1,144 @@
+from .metrics import CHESSCOM_REQUEST_SECONDS, CHESSCOM_WAIT_SECONDS
+from typing import Optional
+import httpx
+import asyncio
+import importlib.util
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHESSCOM_API_URL = "https://api.chess.com/pub"
+
+# Chess.com's public API serves serial requests without limits but answers
+# bursts of parallel requests with 429, so keep both knobs conservative.
+CHESSCOM_MAX_CONCURRENCY = int(os.getenv("CHESSCOM_MAX_CONCURRENCY", "4"))
+CHESSCOM_RATE_LIMIT = float(os.getenv("CHESSCOM_RATE_LIMIT", "8"))  # requests per second
+CHESSCOM_MAX_RETRIES = int(os.getenv("CHESSCOM_MAX_RETRIES", "3"))
+CHESSCOM_HTTP2 = os.getenv("CHESSCOM_HTTP2", "false").lower() in ("1", "true", "yes")
+CHESSCOM_USER_AGENT = os.getenv("CHESSCOM_USER_AGENT", "chess-pgn-analyzer-api")
+
+
+class RateLimiter:
+    """Token bucket limiting how many requests start per second."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChessComClient:
+    """Shared, connection-pooled client for the Chess.com public API."""
+
+    def __init__(
+        self,
+        max_concurrency: int = CHESSCOM_MAX_CONCURRENCY,
+        rate_limit: float = CHESSCOM_RATE_LIMIT,
+        http2: bool = CHESSCOM_HTTP2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("CHESSCOM_HTTP2 is enabled but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=httpx.Timeout(30.0),
+            headers={"User-Agent": CHESSCOM_USER_AGENT},
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = RateLimiter(rate_limit)
+
+    async def get(self, url: str, endpoint: str = "other", **kwargs) -> httpx.Response:
+        # 429, 5xx responses and transport errors (timeouts, dropped
+        # connections) are retried with exponential backoff
+        start = time.perf_counter()
+        async with self._semaphore:
+            CHESSCOM_WAIT_SECONDS.observe(time.perf_counter() - start)
+            for attempt in range(CHESSCOM_MAX_RETRIES + 1):
+                last_attempt = attempt == CHESSCOM_MAX_RETRIES
+                await self._rate_limiter.acquire()
+                try:
+                    response = await self._client.get(url, **kwargs)
+                except httpx.TransportError as e:
+                    if last_attempt:
+                        raise
+                    delay = 2 ** attempt
+                    logger.warning(
+                        f"Error requesting {url} from Chess.com ({e!r}), "
+                        f"retrying in {delay} seconds"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if last_attempt or not retryable:
+                    CHESSCOM_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+                    return response
+
+                if response.status_code == 429:
+                    retry_after = response.headers.get("Retry-After")
+                    if retry_after and retry_after.isdigit():
+                        delay = float(retry_after)
+                    else:
+                        delay = 2 ** attempt
+                    logger.warning(
+                        f"Rate limited by Chess.com on {url}, retrying in {delay} seconds"
+                    )
+                else:
+                    delay = 2 ** attempt
+                    logger.warning(
+                        f"Chess.com answered {response.status_code} on {url}, "
+                        f"retrying in {delay} seconds"
+                    )
+                await asyncio.sleep(delay)
+
+    async def get_player(self, username: str) -> httpx.Response:
+        return await self.get(f"{CHESSCOM_API_URL}/player/{username}", endpoint="player")
+
+    async def get_archive_urls(self, username: str) -> httpx.Response:
+        return await self.get(
+            f"{CHESSCOM_API_URL}/player/{username}/games/archives", endpoint="archives"
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[ChessComClient] = None
+
+
+def get_chesscom_client() -> ChessComClient:
+    global _client
+    if _client is None:
+        _client = ChessComClient()
+    return _client
+
+
+async def close_chesscom_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
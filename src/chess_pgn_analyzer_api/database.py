@@ -1,5 +1,8 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from .metrics import DB_POOL_CHECKOUT_SECONDS
 import os
+import uuid
 from dotenv import load_dotenv
 from typing import AsyncGenerator
 
@@ -14,10 +17,85 @@ if DATABASE_URL is None:
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+# Pool of the API's request sessions
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Separate pool for work outside a request: the analysis worker, streamed
+# responses and maintenance scripts
+DB_BACKGROUND_POOL_SIZE = int(os.getenv("DB_BACKGROUND_POOL_SIZE", "2"))
+DB_BACKGROUND_MAX_OVERFLOW = int(os.getenv("DB_BACKGROUND_MAX_OVERFLOW", "8"))
+# Connections older than this many seconds are replaced; -1 keeps them forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Prepared statements cached per connection
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# PgBouncer in transaction mode pools the connections itself and cannot keep
+# prepared statements between transactions
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+
+class TimedPool:
+    # Includes waiting for a free connection and opening a new one
+    def connect(self):
+        with DB_POOL_CHECKOUT_SECONDS.time():
+            return super().connect()
+
+
+class TimedQueuePool(TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(TimedPool, NullPool):
+    pass
+
+
+def prepared_statement_name() -> str:
+    # Unique names, since PgBouncer may hand a statement another backend's
+    # connection
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def create_database_engine(pool_size: int, max_overflow: int) -> AsyncEngine:
+    if DB_PGBOUNCER:
+        return create_async_engine(
+            DATABASE_URL,
+            future=True,
+            poolclass=TimedNullPool,
+            connect_args={
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": prepared_statement_name,
+            },
+        )
+    return create_async_engine(
+        DATABASE_URL,
+        future=True,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+engine = create_database_engine(DB_POOL_SIZE, DB_MAX_OVERFLOW)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+background_engine = create_database_engine(DB_BACKGROUND_POOL_SIZE, DB_BACKGROUND_MAX_OVERFLOW)
+background_session_maker = async_sessionmaker(background_engine, expire_on_commit=False)
+
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+async def close_database():
+    await engine.dispose()
+    await background_engine.dispose()
@@ -0,0 +1,232 @@
+from sqlmodel import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models.game import Game
+from .metrics import GAMES_UPSERTED
+from .logging_config import configure_logging
+from .move_codec import encode_moves, encode_clocks
+from .pgn_storage import pgn_columns, stored_pgn
+from datetime import datetime
+from typing import Optional
+import asyncio
+import chess
+import chess.pgn
+import io
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# asyncpg allows at most 32767 bind parameters per statement
+UPSERT_CHUNK_SIZE = 32767 // len(Game.__table__.columns)
+
+# Columns refreshed from Chess.com when a game is ingested again; analysis
+# state and ownership are never overwritten.
+UPSERT_COLUMNS = [
+    "url",
+    "pgn",
+    "pgn_compressed",
+    "white_username",
+    "black_username",
+    "white_rating",
+    "black_rating",
+    "white_result",
+    "black_result",
+    "start_time",
+    "end_time",
+    "time_control",
+    "rules",
+    "eco",
+    "eco_name",
+    "eco_code",
+    "tournament",
+    "match",
+    "analysis_result",
+    "white_accuracy",
+    "black_accuracy",
+    "analyzed",
+    "moves",
+    "ply_count",
+    "first_move",
+    "initial_fen",
+    "final_fen",
+    "clocks",
+]
+
+CLOCK_COMMENT = re.compile(r"\[%clk\s+(\d+):(\d+):(\d+(?:\.\d+)?)\]")
+
+# Variants whose moves replay on a python-chess Board
+PARSED_RULES = (None, "chess", "chess960")
+
+UNPARSED_GAME = {
+    "moves": None,
+    "ply_count": None,
+    "first_move": None,
+    "initial_fen": None,
+    "final_fen": None,
+    "clocks": None,
+}
+
+
+class ParsedGameVisitor(chess.pgn.BaseVisitor):
+    """Collects the mainline moves, clocks and final position of a PGN.
+
+    Skips variations and never builds the GameNode tree, which is most of
+    the cost of chess.pgn.read_game.
+    """
+
+    def begin_game(self):
+        self.board = None
+        self.initial_fen = None
+        self.moves = []
+        self.clocks = []
+        self.errors = []
+
+    def visit_board(self, board: chess.Board):
+        # Called with the start position, then again after every move
+        self.board = board
+        if self.initial_fen is None:
+            self.initial_fen = board.fen()
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        self.moves.append(move)
+        self.clocks.append(None)
+
+    def visit_comment(self, comment: str):
+        match = CLOCK_COMMENT.search(comment)
+        if match and self.moves:
+            hours, minutes, seconds = match.groups()
+            self.clocks[-1] = round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 10)
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def handle_error(self, error: Exception):
+        self.errors.append(error)
+
+    def result(self):
+        return self
+
+
+def parse_game_pgn(game_pgn: str) -> dict:
+    """Parses a PGN once at ingest into the columns analysis and analytics use.
+
+    Clocks are the remaining time after each ply in tenths of a second,
+    packed by move_codec.encode_clocks.
+    """
+    parsed = chess.pgn.read_game(io.StringIO(game_pgn or ""), Visitor=ParsedGameVisitor)
+    if parsed is None or parsed.errors or parsed.board is None:
+        return UNPARSED_GAME
+
+    return {
+        "moves": encode_moves(parsed.moves),
+        "ply_count": len(parsed.moves),
+        "first_move": parsed.moves[0].uci() if parsed.moves else None,
+        "initial_fen": None if parsed.initial_fen == chess.STARTING_FEN else parsed.initial_fen,
+        "final_fen": parsed.board.fen(),
+        "clocks": encode_clocks(parsed.clocks) if None not in parsed.clocks else None,
+    }
+
+
+def game_row(player_id: int, game_data: dict, eco_name: str, eco_code: Optional[str]) -> dict:
+    accuracies = game_data.get("accuracies", {})
+    white_accuracy = accuracies.get("white")
+    black_accuracy = accuracies.get("black")
+    parsed = (
+        parse_game_pgn(game_data["pgn"])
+        if game_data.get("rules") in PARSED_RULES
+        else UNPARSED_GAME
+    )
+    return {
+        "player_id": player_id,
+        "game_id": game_data["url"].split("/")[-1],
+        "url": game_data["url"],
+        **pgn_columns(game_data["pgn"], parsed["moves"] is not None),
+        "white_username": game_data["white"]["username"],
+        "black_username": game_data["black"]["username"],
+        "white_rating": game_data["white"]["rating"],
+        "black_rating": game_data["black"]["rating"],
+        "white_result": game_data["white"]["result"],
+        "black_result": game_data["black"]["result"],
+        "start_time": datetime.fromtimestamp(
+            game_data.get("start_time", game_data["end_time"])
+        ),
+        "end_time": datetime.fromtimestamp(game_data["end_time"]),
+        "time_control": game_data["time_control"],
+        "rules": game_data.get("rules"),
+        "eco": game_data.get("eco"),
+        "eco_name": eco_name,
+        "eco_code": eco_code,
+        "tournament": game_data.get("tournament"),
+        "match": game_data.get("match"),
+        "analysis_result": json.dumps(accuracies),
+        "white_accuracy": white_accuracy,
+        "black_accuracy": black_accuracy,
+        "analyzed": Game.has_accuracies(white_accuracy, black_accuracy),
+        "moves_analyzed": False,
+        "is_processing": False,
+        **parsed,
+    }
+
+
+async def upsert_games(session: AsyncSession, rows: list, update_existing: bool = True) -> int:
+    # One INSERT ... ON CONFLICT (game_id) per chunk instead of a SELECT and
+    # INSERT per game.
+    # A statement may not touch the same game twice
+    rows = list({row["game_id"]: row for row in rows}.values())
+    total_games = 0
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(Game).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        if update_existing:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Game.game_id],
+                set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Game.game_id])
+        result = await session.execute(stmt)
+        total_games += result.rowcount
+    GAMES_UPSERTED.inc(total_games)
+    return total_games
+
+
+async def reparse_all_games(batch_size: int = 1000) -> int:
+    # Fills the parsed columns of games stored before they existed
+    from .database import background_session_maker
+
+    total_games = 0
+    last_id = 0
+    async with background_session_maker() as session:
+        while True:
+            result = await session.execute(
+                select(Game.id, Game.pgn, Game.pgn_compressed, Game.rules)
+                .where(Game.id > last_id, Game.ply_count.is_(None))
+                .order_by(Game.id)
+                .limit(batch_size)
+            )
+            games = result.all()
+            if not games:
+                break
+
+            rows = await asyncio.to_thread(
+                lambda: [
+                    {"id": game_id, **parse_game_pgn(stored_pgn(game_pgn, pgn_compressed))}
+                    for game_id, game_pgn, pgn_compressed, rules in games
+                    if rules in PARSED_RULES
+                ]
+            )
+            if rows:
+                await session.execute(update(Game), rows)
+            await session.commit()
+
+            last_id = games[-1].id
+            total_games += len(rows)
+            logger.info(f"Parsed {total_games} games")
+
+    return total_games
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(reparse_all_games())
@@ -2,10 +2,15 @@ from sqlmodel import SQLModel, create_engine
 from .models.player import Player
 from .models.game import Game
 from .models.archive import Archive
+from .models.analysis_job import AnalysisJob
+from .models.eco_opening import EcoOpening
+from .models.move_eval import MoveEval
+from .models.player_stats_weekly import PlayerStatsWeekly
+from .models.position_eval import PositionEval
+from .logging_config import configure_logging
 import os
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://chess_user:chess_password@db:5432/chess_pgn_analyzer")
@@ -21,4 +26,5 @@ def init_db():
         raise
 
 if __name__ == "__main__":
+    configure_logging()
     init_db()
\ No newline at end of file
@@ -0,0 +1,267 @@
+from sqlmodel import select, update, delete, func, and_, or_, case
+from sqlalchemy import literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models.game import Game
+from .models.move_eval import MoveEval
+from .models.analysis_job import AnalysisJob, JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_DEAD
+from .analysis.profiles import DEFAULT_ANALYSIS_PROFILE
+from datetime import timedelta
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_LEASE_SECONDS = int(os.getenv("ANALYSIS_LEASE_SECONDS", "600"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+
+
+def db_now():
+    # Leases are compared against the database clock so workers on different
+    # hosts agree on when a lease has expired.
+    return func.timezone("UTC", func.now())
+
+
+async def enqueue_unanalyzed_games(
+    session: AsyncSession,
+    retry_dead: bool = False,
+    profile: str = DEFAULT_ANALYSIS_PROFILE,
+    reanalyze: bool = False,
+) -> int:
+    """Adds a job for every game that has not been analyzed, or for every
+    game with reanalyze, and returns the number of jobs enqueued or changed.
+
+    Jobs that are still waiting (pending or dead) are switched to the given
+    profile. Finished jobs are only run again with reanalyze, and dead jobs
+    only with retry_dead."""
+    requeued = 0
+    requeue = {
+        "status": JOB_PENDING,
+        "attempts": 0,
+        "profile": profile,
+        "last_error": None,
+        "updated_at": db_now(),
+    }
+    if retry_dead:
+        result = await session.execute(
+            update(AnalysisJob).where(AnalysisJob.status == JOB_DEAD).values(**requeue)
+        )
+        requeued += result.rowcount
+    if reanalyze:
+        result = await session.execute(
+            update(AnalysisJob).where(AnalysisJob.status == JOB_DONE).values(**requeue)
+        )
+        requeued += result.rowcount
+
+    games = select(
+        Game.id,
+        literal(JOB_PENDING),
+        literal(profile),
+        literal(0),
+        literal(ANALYSIS_MAX_ATTEMPTS),
+        db_now(),
+        db_now(),
+    )
+    if not reanalyze:
+        games = games.where(Game.moves_analyzed == False)  # noqa: E712
+    stmt = insert(AnalysisJob).from_select(
+        [
+            "game_id",
+            "status",
+            "profile",
+            "attempts",
+            "max_attempts",
+            "created_at",
+            "updated_at",
+        ],
+        games,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["game_id"],
+        set_={"profile": stmt.excluded.profile, "updated_at": db_now()},
+        where=and_(
+            AnalysisJob.status.in_([JOB_PENDING, JOB_DEAD]),
+            AnalysisJob.profile != stmt.excluded.profile,
+        ),
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return requeued + result.rowcount
+
+
+async def count_jobs(session: AsyncSession) -> dict:
+    result = await session.execute(
+        select(AnalysisJob.status, func.count()).group_by(AnalysisJob.status)
+    )
+    return dict(result.all())
+
+
+async def claim_jobs(
+    session: AsyncSession,
+    worker_id: str,
+    batch_size: int,
+    lease_seconds: int = ANALYSIS_LEASE_SECONDS,
+) -> list:
+    async with session.begin():
+        lease_expired = and_(
+            AnalysisJob.status == JOB_RUNNING, AnalysisJob.lease_expires_at < db_now()
+        )
+
+        # Jobs whose worker died on their last allowed attempt go to the dead
+        # letter state instead of being handed out again.
+        exhausted = (
+            select(AnalysisJob.id)
+            .where(lease_expired, AnalysisJob.attempts >= AnalysisJob.max_attempts)
+            .with_for_update(skip_locked=True)
+        )
+        await session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id.in_(exhausted.scalar_subquery()))
+            .values(
+                status=JOB_DEAD,
+                locked_by=None,
+                lease_expires_at=None,
+                last_error="Lease expired on final attempt",
+                updated_at=db_now(),
+            )
+        )
+
+        claimable = (
+            select(AnalysisJob.id)
+            .where(or_(AnalysisJob.status == JOB_PENDING, lease_expired))
+            .order_by(AnalysisJob.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=JOB_RUNNING,
+                attempts=AnalysisJob.attempts + 1,
+                locked_by=worker_id,
+                lease_expires_at=db_now() + timedelta(seconds=lease_seconds),
+                updated_at=db_now(),
+            )
+            .returning(AnalysisJob.id, AnalysisJob.game_id)
+        )
+        jobs = dict(result.all())
+        if not jobs:
+            return []
+
+        result = await session.execute(
+            select(
+                AnalysisJob.id.label("job_id"),
+                AnalysisJob.profile,
+                Game.id,
+                Game.game_id,
+                Game.player_id,
+                Game.end_time,
+                Game.moves,
+                Game.initial_fen,
+                Game.rules,
+                # The PGN is only needed for games that were never parsed
+                case((Game.moves.is_(None), Game.pgn)).label("pgn"),
+                case((Game.moves.is_(None), Game.pgn_compressed)).label("pgn_compressed"),
+            )
+            .join(Game, Game.id == AnalysisJob.game_id)
+            .where(AnalysisJob.id.in_(jobs.keys()))
+        )
+        return result.all()
+
+
+def move_eval_rows(game_id: int, move_analysis: list) -> list:
+    return [
+        {
+            "game_id": game_id,
+            "ply": ply,
+            "side": move["side"],
+            "uci": move["move"],
+            "eval_cp": move["eval_cp"],
+            "mate": move["mate"],
+            "eval_diff": move["eval_diff"],
+            "category": move["category"],
+            "best_move": move.get("best_move"),
+            "best_move_gap": move.get("best_move_gap"),
+        }
+        for ply, move in enumerate(move_analysis, start=1)
+    ]
+
+
+def held_by(worker_id: str):
+    # A job whose lease expired may have been claimed by another worker since
+    return and_(AnalysisJob.locked_by == worker_id, AnalysisJob.status == JOB_RUNNING)
+
+
+async def renew_leases(
+    session: AsyncSession,
+    job_ids: list,
+    worker_id: str,
+    lease_seconds: int = ANALYSIS_LEASE_SECONDS,
+) -> int:
+    async with session.begin():
+        result = await session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id.in_(job_ids), held_by(worker_id))
+            .values(
+                lease_expires_at=db_now() + timedelta(seconds=lease_seconds),
+                updated_at=db_now(),
+            )
+        )
+    return result.rowcount
+
+
+async def complete_job(
+    session: AsyncSession, job_id: int, worker_id: str, game_id: int, move_analysis: list
+) -> bool:
+    """Stores the analysis of a job this worker still holds. Returns False,
+    storing nothing, when the job was taken over by another worker."""
+    async with session.begin():
+        # Locks the job row first, so a concurrent claim skips it
+        result = await session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, held_by(worker_id))
+            .values(
+                status=JOB_DONE,
+                locked_by=None,
+                lease_expires_at=None,
+                last_error=None,
+                updated_at=db_now(),
+            )
+            .returning(AnalysisJob.id)
+        )
+        if result.scalar_one_or_none() is None:
+            return False
+
+        # A re-analysed game replaces its previous rows
+        await session.execute(delete(MoveEval).where(MoveEval.game_id == game_id))
+        if move_analysis:
+            await session.execute(insert(MoveEval), move_eval_rows(game_id, move_analysis))
+        await session.execute(
+            update(Game).where(Game.id == game_id).values(moves_analyzed=True)
+        )
+    return True
+
+
+async def fail_job(session: AsyncSession, job_id: int, worker_id: str, error: str):
+    async with session.begin():
+        result = await session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, held_by(worker_id))
+            .values(
+                status=case(
+                    (AnalysisJob.attempts >= AnalysisJob.max_attempts, JOB_DEAD),
+                    else_=JOB_PENDING,
+                ),
+                locked_by=None,
+                lease_expires_at=None,
+                last_error=error,
+                updated_at=db_now(),
+            )
+            .returning(AnalysisJob.status)
+        )
+        status = result.scalar_one_or_none()
+    if status is None:
+        logger.warning(f"Analysis job {job_id} is no longer held by {worker_id}, not failing it")
+    elif status == JOB_DEAD:
+        logger.warning(f"Analysis job {job_id} moved to dead letter state: {error}")
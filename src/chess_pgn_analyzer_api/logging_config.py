@@ -0,0 +1,132 @@
+"""Logging setup shared by the API, the analysis worker and the scripts.
+
+Records are handed to a queue and written by a listener thread, so a slow
+stderr or log collector never blocks analysis or the event loop.
+
+    LOG_LEVEL=INFO
+    LOG_LEVELS=analysis=WARNING,httpx=WARNING
+    LOG_FORMAT=json
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import pkgutil
+import queue
+import random
+import threading
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Comma-separated logger=LEVEL overrides. Modules of this package may be
+# named relative to it (analysis, worker, ...), other loggers in full.
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text or json
+# Log every SQL statement through the sqlalchemy.engine logger
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+# Fraction of per-move analysis events that are logged
+MOVE_LOG_SAMPLE_RATE = float(os.getenv("MOVE_LOG_SAMPLE_RATE", "0.01"))
+
+PACKAGE = __name__.rpartition(".")[0]
+PACKAGE_MODULES = {module.name for module in pkgutil.iter_modules([str(Path(__file__).parent)])}
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else came in through extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Passes a random fraction of the records logged on a logger."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.rate >= 1 or random.random() < self.rate
+
+
+def logger_name(component: str) -> str:
+    if component.split(".")[0] in PACKAGE_MODULES:
+        return f"{PACKAGE}.{component}"
+    return component
+
+
+def parse_log_levels(levels: str) -> dict:
+    overrides = {}
+    for entry in levels.split(","):
+        if entry.strip():
+            component, _, level = entry.partition("=")
+            overrides[logger_name(component.strip())] = level.strip().upper()
+    return overrides
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Routes the root logger through a queue to stderr. Safe to call more
+    than once; only the first call in a process has an effect."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+        )
+        log_queue: queue.Queue = queue.Queue(-1)
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(level)
+
+        levels = {"sqlalchemy.engine": "INFO"} if SQL_ECHO else {}
+        levels.update(parse_log_levels(LOG_LEVELS))
+        for name, name_level in levels.items():
+            logging.getLogger(name).setLevel(name_level)
+
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging():
+    # Flushes the queue; called at exit
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
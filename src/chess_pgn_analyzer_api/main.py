@@ -1,11 +1,25 @@
 from fastapi import FastAPI
-from .routes import players, games, moves
+from contextlib import asynccontextmanager
+from .chesscom import close_chesscom_client
+from .database import close_database
+from .logging_config import configure_logging
+from .routes import players, games, moves, metrics
 
-app = FastAPI(title="Chess PGN Analyzer API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    yield
+    await close_chesscom_client()
+    await close_database()
+
+
+app = FastAPI(title="Chess PGN Analyzer API", lifespan=lifespan)
 
 app.include_router(players.router, prefix="/api/v1")
 app.include_router(games.router, prefix="/api/v1")
 app.include_router(moves.router, prefix="/api/v1")
+app.include_router(metrics.router)
 
 
 @app.get("/")
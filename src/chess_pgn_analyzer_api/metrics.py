@@ -0,0 +1,62 @@
+from prometheus_client import Counter, Gauge, Histogram
+import os
+
+# Port of the analysis worker's own /metrics endpoint; 0 disables it
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))
+
+# Analysis of one game takes seconds to minutes depending on profile and length
+ANALYSIS_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300, 600)
+
+ANALYSIS_SECONDS = Histogram(
+    "chess_analysis_game_seconds",
+    "Time spent analyzing one game in a worker process",
+    ["profile"],
+    buckets=ANALYSIS_BUCKETS,
+)
+ANALYSIS_WAIT_SECONDS = Histogram(
+    "chess_analysis_wait_seconds",
+    "Time a claimed game waited for a free analysis process",
+    buckets=ANALYSIS_BUCKETS,
+)
+ANALYSIS_GAMES = Counter(
+    "chess_analysis_games_total",
+    "Games analyzed by the worker",
+    ["profile", "status"],
+)
+ENGINE_SEARCHES = Counter(
+    "chess_engine_searches_total",
+    "Positions searched by the engine",
+)
+ENGINE_NODES = Counter(
+    "chess_engine_nodes_total",
+    "Nodes searched by the engine",
+)
+ENGINE_POSITIONS_PER_SECOND = Histogram(
+    "chess_engine_positions_per_second",
+    "Positions searched per second of analysis, per game",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+ANALYSIS_QUEUE_DEPTH = Gauge(
+    "chess_analysis_queue_depth",
+    "Games whose moves have not been analyzed yet",
+)
+
+CHESSCOM_REQUEST_SECONDS = Histogram(
+    "chess_chesscom_request_seconds",
+    "Latency of Chess.com API requests, including rate limiting and retries",
+    ["endpoint"],
+)
+CHESSCOM_WAIT_SECONDS = Histogram(
+    "chess_chesscom_wait_seconds",
+    "Time a Chess.com request waited for the client's concurrency limit",
+)
+GAMES_UPSERTED = Counter(
+    "chess_games_upserted_total",
+    "Games inserted or updated from Chess.com archives",
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "chess_db_pool_checkout_seconds",
+    "Time taken to check out a connection from the SQLAlchemy pool",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
@@ -1,6 +1,11 @@
 from .player import Player
 from .game import Game
 from .archive import Archive
+from .analysis_job import AnalysisJob
+from .eco_opening import EcoOpening
+from .move_eval import MoveEval
+from .player_stats_weekly import PlayerStatsWeekly
+from .position_eval import PositionEval
 from sqlmodel import Relationship
 
 Player.games = Relationship(
@@ -12,4 +17,13 @@ Player.archives = Relationship(
 Game.player = Relationship(back_populates="games")
 Archive.player = Relationship(back_populates="archives")
 
-__all__ = ["Player", "Game", "Archive"]
+__all__ = [
+    "Player",
+    "Game",
+    "Archive",
+    "AnalysisJob",
+    "EcoOpening",
+    "MoveEval",
+    "PlayerStatsWeekly",
+    "PositionEval",
+]
@@ -0,0 +1,27 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+# Job states; "dead" jobs exhausted max_attempts and are only retried on
+# explicit request.
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_DEAD = "dead"
+
+
+class AnalysisJob(SQLModel, table=True):
+    __tablename__ = "analysis_job"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    game_id: int = Field(foreign_key="game.id", unique=True)
+    status: str = Field(default=JOB_PENDING, index=True)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    # Analysis profile (see analysis.profiles) the game is analyzed with
+    profile: str = Field(default="standard")
+    locked_by: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
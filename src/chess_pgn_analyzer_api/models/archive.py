@@ -12,3 +12,22 @@ class Archive(SQLModel, table=True):
     downloaded: bool = False
     last_download: Optional[datetime] = None
     is_current_month: bool = Field(default=False)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # end_time of the newest stored game, only newer games are inserted
+    last_game_end_time: Optional[datetime] = None
+
+    def is_complete(self) -> bool:
+        # An archive downloaded after its month ended can no longer change
+        if not self.downloaded or self.last_download is None:
+            return False
+        next_month = datetime(self.year + self.month // 12, self.month % 12 + 1, 1)
+        return self.last_download >= next_month
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
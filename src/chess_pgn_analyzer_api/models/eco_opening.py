@@ -0,0 +1,10 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class EcoOpening(SQLModel, table=True):
+    __tablename__ = "eco_opening"
+
+    url: str = Field(primary_key=True)
+    name: str
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,21 +1,30 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from typing import Optional
 from datetime import datetime
-import json
-import requests
-from bs4 import BeautifulSoup
 
 
 class Game(SQLModel, table=True):
+    # Serves the keyset pagination of a player's games, newest first
+    __table_args__ = (Index("ix_game_player_id_end_time_id", "player_id", "end_time", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     player_id: int = Field(foreign_key="player.id")
-    game_id: str = Field(index=True)
+    game_id: str = Field(index=True, unique=True)
     url: str
-    pgn: str
+    # One of the two holds the original PGN, depending on GAME_PGN_STORAGE
+    # (see pgn_storage); both are empty when it is rebuilt from the columns
+    # below
+    pgn: Optional[str] = None
+    pgn_compressed: Optional[bytes] = None
     analyzed: bool = Field(default=False)
     analysis_result: Optional[str] = None
+    # Chess.com accuracies from analysis_result, as columns Postgres can filter
+    # and aggregate on
+    white_accuracy: Optional[float] = None
+    black_accuracy: Optional[float] = None
     moves_analyzed: bool = Field(default=False)
     is_processing: bool = Field(default=False)
+    # Legacy JSON analysis; per-move results are stored in move_eval
     move_analysis: Optional[str] = None
     white_username: str
     black_username: str
@@ -29,35 +38,23 @@ class Game(SQLModel, table=True):
     rules: Optional[str]
     eco: Optional[str]
     eco_name: Optional[str] = None
+    eco_code: Optional[str] = Field(default=None, index=True)
     tournament: Optional[str]
     match: Optional[str]
+    # Parsed from the PGN at ingest (see ingest.parse_game_pgn): moves packed
+    # by move_codec, clocks in tenths of a second after each ply and
+    # delta-encoded by move_codec, and initial_fen only for games not starting
+    # from the standard position
+    moves: Optional[bytes] = None
+    ply_count: Optional[int] = None
+    first_move: Optional[str] = None
+    initial_fen: Optional[str] = None
+    final_fen: Optional[str] = None
+    clocks: Optional[bytes] = None
 
     def set_analyzed_status(self):
-        if self.analysis_result:
-            try:
-                analysis_data = json.loads(self.analysis_result)
-                self.analyzed = bool(analysis_data) and any(analysis_data.values())
-            except json.JSONDecodeError:
-                self.analyzed = False
-        else:
-            self.analyzed = False
+        self.analyzed = Game.has_accuracies(self.white_accuracy, self.black_accuracy)
 
     @staticmethod
-    def fetch_opening_name(eco_url: str) -> str:
-        if not eco_url or not isinstance(eco_url, str):
-            return "Unknown"
-        
-        try:
-            response = requests.get(eco_url, timeout=5)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-            
-            if twitter_title and twitter_title.get('content'):
-                opening_name = twitter_title['content'].replace(' - Chess Openings', '')
-                return opening_name
-            
-            return "Unknown"
-        except Exception as e:
-            print(f"Error fetching opening name: {str(e)}")
-            return "Unknown"
+    def has_accuracies(white_accuracy: Optional[float], black_accuracy: Optional[float]) -> bool:
+        return bool(white_accuracy or black_accuracy)
@@ -0,0 +1,23 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+
+
+class MoveEval(SQLModel, table=True):
+    __tablename__ = "move_eval"
+    __table_args__ = (Index("ix_move_eval_game_id_ply", "game_id", "ply", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    game_id: int = Field(foreign_key="game.id")
+    ply: int
+    side: str  # "white" or "black", the side that played the move
+    uci: str
+    # White-relative evaluation after the move; mate is set instead of
+    # eval_cp for forced mates.
+    eval_cp: Optional[int] = None
+    mate: Optional[int] = None
+    eval_diff: int
+    category: str = Field(index=True)
+    # Engine's preferred move in the position before and how many centipawns
+    # the played move falls short of it (<= 0), from multipv analysis
+    best_move: Optional[str] = None
+    best_move_gap: Optional[int] = None
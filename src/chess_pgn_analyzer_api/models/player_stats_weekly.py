@@ -0,0 +1,30 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class PlayerStatsWeekly(SQLModel, table=True):
+    """Per-player, per-week and per-time-control game aggregates.
+
+    Sums are stored rather than averages so weeks and time controls can be
+    combined exactly when queried.
+    """
+
+    __tablename__ = "player_stats_weekly"
+
+    player_id: int = Field(foreign_key="player.id", primary_key=True)
+    week: datetime = Field(primary_key=True)  # Monday 00:00, date_trunc('week')
+    time_control: str = Field(primary_key=True)
+    games: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    white_games: int = 0
+    rating_sum: int = 0
+    accuracy_games: int = 0
+    accuracy_sum: float = 0
+    analyzed_moves: int = 0
+    eval_diff_sum: int = 0
+    blunders: int = 0
+    mistakes: int = 0
+    dubious_moves: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
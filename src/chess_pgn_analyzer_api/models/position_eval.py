@@ -0,0 +1,21 @@
+from sqlmodel import SQLModel, Field, BigInteger
+from typing import Optional
+from datetime import datetime
+
+
+class PositionEval(SQLModel, table=True):
+    """Engine evaluations shared by every game reaching the same position.
+
+    Keyed by the position's Zobrist hash, stored signed to fit a bigint, and
+    by the search depth and engine name an evaluation was made with.
+    """
+
+    __tablename__ = "position_eval"
+
+    zobrist: int = Field(primary_key=True, sa_type=BigInteger)
+    depth: int = Field(primary_key=True)
+    engine: str = Field(primary_key=True)
+    # White-relative, as in move_eval
+    eval_cp: Optional[int] = None
+    mate: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,75 @@
+import chess
+import struct
+
+# A move packs into 16 bits: from square (6), to square (6) and promotion
+# piece type (3, 0 when none). Move lists are stored big-endian, two bytes
+# per ply.
+
+FROM_MASK = 0x3F
+TO_SHIFT = 6
+PROMOTION_SHIFT = 12
+
+
+def encode_move(move: chess.Move) -> int:
+    return (
+        move.from_square
+        | move.to_square << TO_SHIFT
+        | (move.promotion or 0) << PROMOTION_SHIFT
+    )
+
+
+def decode_move(code: int) -> chess.Move:
+    return chess.Move(
+        code & FROM_MASK,
+        code >> TO_SHIFT & FROM_MASK,
+        promotion=code >> PROMOTION_SHIFT or None,
+    )
+
+
+def encode_moves(moves: list) -> bytes:
+    return struct.pack(f">{len(moves)}H", *[encode_move(move) for move in moves])
+
+
+def decode_moves(data: bytes) -> list:
+    return [decode_move(code) for code in struct.unpack(f">{len(data) // 2}H", data)]
+
+
+# Clocks are stored as the change of each side's clock since that side's
+# previous move, zigzag-encoded into base-128 varints: a ply usually costs a
+# single byte instead of four.
+
+
+def encode_varints(values: list) -> bytes:
+    data = bytearray()
+    for value in values:
+        value = value << 1 if value >= 0 else (-value << 1) - 1
+        while value >= 0x80:
+            data.append(value & 0x7F | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+def decode_varints(data: bytes) -> list:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value >> 1 if not value & 1 else -((value + 1) >> 1))
+            value = shift = 0
+    return values
+
+
+def encode_clocks(clocks: list) -> bytes:
+    return encode_varints(
+        [clock - clocks[ply - 2] if ply >= 2 else clock for ply, clock in enumerate(clocks)]
+    )
+
+
+def decode_clocks(data: bytes) -> list:
+    clocks = decode_varints(data)
+    for ply in range(2, len(clocks)):
+        clocks[ply] += clocks[ply - 2]
+    return clocks
@@ -0,0 +1,244 @@
+from sqlmodel import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models.game import Game
+from .models.eco_opening import EcoOpening
+from .chesscom import get_chesscom_client
+from .pgn_storage import stored_pgn
+from .logging_config import configure_logging
+from bs4 import BeautifulSoup
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+import asyncio
+import csv
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPENINGS_PATH = Path(__file__).parent / "data" / "openings.tsv"
+
+# "offline" names games from the bundled opening dataset; "online" prefers the
+# name chess.com shows for the game's ECO URL, fetching unseen URLs once.
+OPENING_RESOLVER_MODE = os.getenv("OPENING_RESOLVER_MODE", "offline")
+OPENING_CACHE_SIZE = int(os.getenv("OPENING_CACHE_SIZE", "4096"))
+
+# Movetext tokens: comments, variations, headers, NAGs, move numbers and
+# results are matched so they can be skipped; only group 1 captures SAN.
+MOVETEXT_TOKEN = re.compile(
+    r"\{[^}]*\}|\([^)]*\)|\[[^\]]*\]|;[^\n]*|\$\d+|\d+\.+"
+    r"|1-0|0-1|1/2-1/2|\*|([^\s{}()\[\];$]+)"
+)
+
+
+def normalize_san(san: str) -> str:
+    return san.rstrip("+#!?").replace("0-0-0", "O-O-O").replace("0-0", "O-O")
+
+
+class OpeningTrie:
+    """Prefix tree of SAN move sequences from the bundled opening dataset.
+
+    Classifying a game walks its movetext token by token and keeps the deepest
+    named line, without replaying moves on a board.
+    """
+
+    __slots__ = ("children", "opening")
+
+    def __init__(self):
+        self.children = {}
+        self.opening = None
+
+    def insert(self, sans: list, opening: tuple):
+        node = self
+        for san in sans:
+            node = node.children.setdefault(normalize_san(san), OpeningTrie())
+        node.opening = opening
+
+    def classify(self, game_pgn: str) -> Optional[tuple]:
+        # Games from a custom start position can't follow a book line
+        if '[FEN "' in game_pgn:
+            return None
+
+        node = self
+        opening = None
+        for match in MOVETEXT_TOKEN.finditer(game_pgn):
+            san = match.group(1)
+            if san is None:
+                continue
+            node = node.children.get(normalize_san(san))
+            if node is None:
+                break
+            if node.opening is not None:
+                opening = node.opening
+        return opening
+
+
+@lru_cache(maxsize=1)
+def load_opening_trie() -> OpeningTrie:
+    trie = OpeningTrie()
+    with open(OPENINGS_PATH, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            sans = [token for token in row["pgn"].split() if not token.endswith(".")]
+            trie.insert(sans, (row["eco"], row["name"]))
+    return trie
+
+
+def classify_opening(game_pgn: str) -> Optional[tuple]:
+    """Returns the (eco_code, eco_name) of the deepest known line, if any."""
+    return load_opening_trie().classify(game_pgn or "")
+
+
+def parse_opening_name(html: bytes) -> Optional[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    twitter_title = soup.find("meta", attrs={"name": "twitter:title"})
+    if twitter_title and twitter_title.get("content"):
+        return twitter_title["content"].replace(" - Chess Openings", "")
+    return None
+
+
+class OpeningResolver:
+    """Resolves opening names for ingested games.
+
+    In "online" mode chess.com ECO URLs are looked up in an in-process LRU,
+    then the eco_opening table, and only URLs seen for the first time are
+    fetched. Games without a resolved URL, and every game in "offline" mode,
+    are named by the local classifier.
+    """
+
+    def __init__(self, maxsize: int = OPENING_CACHE_SIZE, mode: str = OPENING_RESOLVER_MODE):
+        self.maxsize = maxsize
+        self.mode = mode
+        self._cache: OrderedDict = OrderedDict()
+
+    def _cache_get(self, url: str) -> Optional[str]:
+        name = self._cache.get(url)
+        if name is not None:
+            self._cache.move_to_end(url)
+        return name
+
+    def _cache_put(self, url: str, name: str):
+        self._cache[url] = name
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        try:
+            response = await get_chesscom_client().get(
+                url, endpoint="opening", follow_redirects=True
+            )
+            if response.status_code != 200:
+                return None
+            return await asyncio.to_thread(parse_opening_name, response.content)
+        except Exception as e:
+            logger.warning(f"Error fetching opening name from {url}: {str(e)}")
+            return None
+
+    async def resolve_urls(self, session: AsyncSession, urls: set) -> dict:
+        names = {}
+        for url in urls:
+            name = self._cache_get(url)
+            if name is not None:
+                names[url] = name
+
+        missing = urls - names.keys()
+        if missing:
+            result = await session.execute(
+                select(EcoOpening.url, EcoOpening.name).where(EcoOpening.url.in_(missing))
+            )
+            for url, name in result.all():
+                names[url] = name
+                self._cache_put(url, name)
+
+        missing = urls - names.keys()
+        if missing and self.mode == "online":
+            missing = list(missing)
+            fetched = await asyncio.gather(*[self._fetch(url) for url in missing])
+            rows = [
+                {"url": url, "name": name}
+                for url, name in zip(missing, fetched)
+                if name is not None
+            ]
+            if rows:
+                await session.execute(
+                    insert(EcoOpening).values(rows).on_conflict_do_nothing(index_elements=["url"])
+                )
+                for row in rows:
+                    names[row["url"]] = row["name"]
+                    self._cache_put(row["url"], row["name"])
+
+        return names
+
+    async def resolve(self, session: AsyncSession, games_data: list, openings: list) -> list:
+        names = {}
+        if self.mode == "online":
+            urls = {game_data["eco"] for game_data in games_data if game_data.get("eco")}
+            names = await self.resolve_urls(session, urls)
+
+        resolved = []
+        for game_data, opening in zip(games_data, openings):
+            name = names.get(game_data.get("eco"))
+            if name is None:
+                name = opening[1] if opening else "Unknown"
+            resolved.append(name)
+        return resolved
+
+
+_resolver: Optional[OpeningResolver] = None
+
+
+def get_opening_resolver() -> OpeningResolver:
+    global _resolver
+    if _resolver is None:
+        _resolver = OpeningResolver()
+    return _resolver
+
+
+async def reclassify_all_games(batch_size: int = 5000) -> int:
+    # Classification is pure CPU with no I/O, so the whole table can be
+    # re-labelled in large batches whenever the opening dataset changes.
+    from .database import background_session_maker
+
+    total_games = 0
+    last_id = 0
+    async with background_session_maker() as session:
+        while True:
+            result = await session.execute(
+                select(Game.id, Game.pgn, Game.pgn_compressed)
+                .where(Game.id > last_id)
+                .order_by(Game.id)
+                .limit(batch_size)
+            )
+            games = result.all()
+            if not games:
+                break
+
+            rows = []
+            for game_id, game_pgn, pgn_compressed in games:
+                game_pgn = stored_pgn(game_pgn, pgn_compressed)
+                if game_pgn is None:
+                    # Stored without a PGN; keeps the opening it was ingested with
+                    continue
+                opening = classify_opening(game_pgn)
+                rows.append({
+                    "id": game_id,
+                    "eco_code": opening[0] if opening else None,
+                    "eco_name": opening[1] if opening else "Unknown",
+                })
+            if rows:
+                await session.execute(update(Game), rows)
+            await session.commit()
+
+            last_id = games[-1].id
+            total_games += len(rows)
+            logger.info(f"Reclassified {total_games} games")
+
+    return total_games
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(reclassify_all_games())
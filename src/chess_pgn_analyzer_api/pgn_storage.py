@@ -0,0 +1,155 @@
+from sqlmodel import select, update, or_
+from .models.game import Game
+from .move_codec import decode_moves, decode_clocks
+from .logging_config import configure_logging
+from .analysis.evaluation import start_board
+from itertools import zip_longest
+from typing import Optional
+import asyncio
+import chess
+import chess.pgn
+import logging
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# How a game's original PGN text is kept once it has been parsed:
+#   text        in game.pgn, as before
+#   compressed  in game.pgn_compressed, with zstd when the zstandard package is
+#               installed and zlib otherwise
+#   none        not at all; /games/{game_id}/pgn rebuilds it from the parsed
+#               columns. Games that could not be parsed are kept compressed.
+GAME_PGN_STORAGE = os.getenv("GAME_PGN_STORAGE", "text")
+PGN_COMPRESSION_LEVEL = int(os.getenv("PGN_COMPRESSION_LEVEL", "9"))
+
+# The first byte of pgn_compressed names the codec it was written with
+CODEC_ZLIB = b"\x01"
+CODEC_ZSTD = b"\x02"
+
+
+def compress_pgn(game_pgn: str) -> bytes:
+    data = game_pgn.encode()
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=PGN_COMPRESSION_LEVEL).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, PGN_COMPRESSION_LEVEL)
+
+
+def decompress_pgn(data: bytes) -> str:
+    data = bytes(data)  # psycopg2 returns bytea as a memoryview
+    codec, payload = data[:1], data[1:]
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is required to read this PGN")
+        return zstandard.ZstdDecompressor().decompress(payload).decode()
+    return zlib.decompress(payload).decode()
+
+
+def pgn_columns(game_pgn: str, parsed: bool) -> dict:
+    if GAME_PGN_STORAGE == "text":
+        return {"pgn": game_pgn, "pgn_compressed": None}
+    if GAME_PGN_STORAGE == "none" and parsed:
+        return {"pgn": None, "pgn_compressed": None}
+    return {"pgn": None, "pgn_compressed": compress_pgn(game_pgn)}
+
+
+def stored_pgn(game_pgn: Optional[str], pgn_compressed: Optional[bytes]) -> Optional[str]:
+    if game_pgn is not None:
+        return game_pgn
+    if pgn_compressed is not None:
+        return decompress_pgn(pgn_compressed)
+    return None
+
+
+def game_result(white_result: str, black_result: str) -> str:
+    if white_result == "win":
+        return "1-0"
+    if black_result == "win":
+        return "0-1"
+    return "1/2-1/2"
+
+
+def rebuild_pgn(game) -> str:
+    """Rebuilds a PGN from a game's columns and packed moves.
+
+    Only the headers kept as columns survive; the moves and clocks are exact.
+    """
+    pgn = chess.pgn.Game()
+    pgn.setup(start_board(game.initial_fen, game.rules))
+    pgn.headers["Site"] = "Chess.com"
+    pgn.headers["Date"] = (game.start_time or game.end_time).strftime("%Y.%m.%d")
+    pgn.headers["Round"] = "-"
+    pgn.headers["White"] = game.white_username
+    pgn.headers["Black"] = game.black_username
+    pgn.headers["Result"] = game_result(game.white_result, game.black_result)
+    pgn.headers["WhiteElo"] = str(game.white_rating)
+    pgn.headers["BlackElo"] = str(game.black_rating)
+    pgn.headers["TimeControl"] = game.time_control
+    if game.eco_code:
+        pgn.headers["ECO"] = game.eco_code
+    if game.eco:
+        pgn.headers["ECOUrl"] = game.eco
+    pgn.headers["EndTime"] = game.end_time.strftime("%H:%M:%S")
+    pgn.headers["Link"] = game.url
+
+    moves = decode_moves(game.moves)
+    clocks = decode_clocks(game.clocks) if game.clocks is not None else []
+    node = pgn
+    for move, clock in zip_longest(moves, clocks[:len(moves)]):
+        node = node.add_variation(move)
+        if clock is not None:
+            node.set_clock(clock / 10)
+    return str(pgn)
+
+
+async def compact_all_games(batch_size: int = 1000) -> int:
+    # Moves the PGN of every stored game to the current GAME_PGN_STORAGE mode
+    from .database import background_session_maker
+
+    total_games = 0
+    last_id = 0
+    async with background_session_maker() as session:
+        while True:
+            result = await session.execute(
+                select(Game.id, Game.pgn, Game.pgn_compressed, Game.moves.is_not(None))
+                .where(
+                    Game.id > last_id,
+                    or_(Game.pgn.is_not(None), Game.pgn_compressed.is_not(None)),
+                )
+                .order_by(Game.id)
+                .limit(batch_size)
+            )
+            games = result.all()
+            if not games:
+                break
+
+            def changed_rows():
+                rows = []
+                for game_id, game_pgn, pgn_compressed, parsed in games:
+                    columns = pgn_columns(stored_pgn(game_pgn, pgn_compressed), parsed)
+                    if (columns["pgn"] is None) != (game_pgn is None) or (
+                        columns["pgn_compressed"] is None
+                    ) != (pgn_compressed is None):
+                        rows.append({"id": game_id, **columns})
+                return rows
+
+            rows = await asyncio.to_thread(changed_rows)
+            if rows:
+                await session.execute(update(Game), rows)
+            await session.commit()
+
+            last_id = games[-1].id
+            total_games += len(rows)
+            logger.info(f"Moved {total_games} games to {GAME_PGN_STORAGE} PGN storage")
+
+    return total_games
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(compact_all_games())
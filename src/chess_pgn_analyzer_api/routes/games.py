@@ -1,16 +1,159 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import select, update
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlmodel import select, update, func, case, tuple_
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..database import get_session
+from ..database import get_session, background_session_maker
 from ..models.game import Game
 from ..models.archive import Archive
+from ..chesscom import get_chesscom_client
+from ..ingest import game_row, upsert_games
+from ..move_codec import decode_moves, decode_clocks
+from ..pgn_storage import stored_pgn, rebuild_pgn
+from ..openings import classify_opening, get_opening_resolver
+from ..analytics import player_accuracy
+from ..stats import refresh_player_weeks
 from .players import get_or_create_player
+from datetime import date, datetime, time, timedelta
+from typing import Literal, Optional
+import asyncio
+import base64
 import httpx
-from datetime import datetime
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DEFAULT_GAMES_PAGE_SIZE = 100
+MAX_GAMES_PAGE_SIZE = 1000
+
+# pgn_compressed is served decompressed as pgn
+GAME_FIELDS = tuple(
+    column for column in Game.__table__.columns.keys() if column != "pgn_compressed"
+)
+# The large columns are only returned when asked for with ?fields=
+DEFAULT_GAME_FIELDS = tuple(
+    column
+    for column in GAME_FIELDS
+    if column not in ("pgn", "move_analysis", "moves", "clocks")
+)
+
+
+def parse_game_fields(fields: Optional[str]) -> list:
+    if not fields:
+        return list(DEFAULT_GAME_FIELDS)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in GAME_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown game fields: {', '.join(unknown)}"
+        )
+    return requested
+
+
+def game_columns(fields: list) -> list:
+    # id and end_time form the pagination cursor, so they are always selected
+    names = fields + [name for name in ("id", "end_time") if name not in fields]
+    if "pgn" in fields:
+        names.append("pgn_compressed")
+    return [getattr(Game, name) for name in names]
+
+
+def game_fields(row, fields: list) -> dict:
+    values = {field: row._mapping[field] for field in fields}
+    if values.get("moves") is not None:
+        values["moves"] = [move.uci() for move in decode_moves(values["moves"])]
+    if values.get("clocks") is not None:
+        values["clocks"] = decode_clocks(values["clocks"])
+    if "pgn" in values:
+        values["pgn"] = stored_pgn(values["pgn"], row.pgn_compressed)
+    return values
+
+
+def encode_games_cursor(end_time: datetime, game_id: int) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([end_time.isoformat(), game_id]).encode()
+    ).decode()
+
+
+def decode_games_cursor(cursor: str) -> tuple:
+    try:
+        end_time, game_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(end_time), int(game_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def filter_player_games(
+    query,
+    username: str,
+    time_control: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    color: Optional[str] = None,
+    result: Optional[str] = None,
+    min_accuracy: Optional[float] = None,
+    max_accuracy: Optional[float] = None,
+):
+    if time_control:
+        query = query.where(Game.time_control == time_control)
+    if since:
+        query = query.where(Game.end_time >= datetime.combine(since, time.min))
+    if until:
+        query = query.where(Game.end_time < datetime.combine(until + timedelta(days=1), time.min))
+
+    is_white = func.lower(Game.white_username) == username.lower()
+    if color == "white":
+        query = query.where(is_white)
+    elif color == "black":
+        query = query.where(func.lower(Game.black_username) == username.lower())
+
+    if min_accuracy is not None:
+        query = query.where(player_accuracy(username) >= min_accuracy)
+    if max_accuracy is not None:
+        query = query.where(player_accuracy(username) <= max_accuracy)
+
+    if result:
+        player_result = case((is_white, Game.white_result), else_=Game.black_result)
+        opponent_result = case((is_white, Game.black_result), else_=Game.white_result)
+        if result == "win":
+            query = query.where(player_result == "win")
+        elif result == "loss":
+            query = query.where(opponent_result == "win")
+        else:
+            query = query.where(player_result != "win", opponent_result != "win")
+    return query
+
+
+async def stream_games_ndjson(query, fields: list):
+    # Uses its own session: the request's session is closed by the time a
+    # streamed response body is being sent.
+    async with background_session_maker() as session:
+        rows = await session.stream(query.execution_options(yield_per=1000))
+        async for row in rows:
+            yield json.dumps(jsonable_encoder(game_fields(row, fields))) + "\n"
+
+
+async def store_archive_games(
+    session: AsyncSession, player_id: int, games_data: list, is_current_month: bool
+) -> int:
+    openings = [classify_opening(game_data.get("pgn")) for game_data in games_data]
+    eco_names = await get_opening_resolver().resolve(session, games_data, openings)
+    # Building rows parses every PGN, so it runs off the event loop
+    rows = await asyncio.to_thread(
+        lambda: [
+            game_row(player_id, game_data, eco_name, opening[0] if opening else None)
+            for game_data, eco_name, opening in zip(games_data, eco_names, openings)
+        ]
+    )
+
+    # Games from past months never change, only the current month is refreshed
+    return await upsert_games(session, rows, update_existing=is_current_month)
+
 
 @router.post("/players/{username}/fetch-and-store-games")
 async def fetch_and_store_games(
@@ -20,49 +163,49 @@ async def fetch_and_store_games(
     if not player:
         raise HTTPException(status_code=404, detail="Failed to fetch player data")
 
-    async with httpx.AsyncClient() as client:
-        # Fetch archives
-        archives_response = await client.get(
-            f"https://api.chess.com/pub/player/{username}/games/archives"
+    client = get_chesscom_client()
+
+    # Fetch archives
+    archives_response = await client.get_archive_urls(username)
+    if archives_response.status_code != 200:
+        raise HTTPException(
+            status_code=archives_response.status_code,
+            detail="Failed to fetch archives from Chess.com",
         )
-        if archives_response.status_code != 200:
-            raise HTTPException(
-                status_code=archives_response.status_code,
-                detail="Failed to fetch archives from Chess.com",
-            )
 
-        archives_data = archives_response.json()["archives"]
+    archives_data = archives_response.json()["archives"]
 
     total_archives = 0
     total_games = 0
+    not_modified_archives = 0
+    failed_archives = 0
+    stored_end_times = []
     current_year, current_month = datetime.now().year, datetime.now().month
 
     # Reset is_current_month for all archives
     await session.execute(update(Archive).values(is_current_month=False))
 
+    existing_archives = await session.execute(
+        select(Archive).where(Archive.player_id == player.id)
+    )
+    existing_archives = {
+        (archive.year, archive.month): archive
+        for archive in existing_archives.scalars().all()
+    }
+
+    pending_archives = []
     for archive_url in archives_data:
         year, month = map(int, archive_url.split("/")[-2:])
-
-        # Check if archive already exists
-        existing_archive = await session.execute(
-            select(Archive).where(
-                Archive.player_id == player.id,
-                Archive.year == year,
-                Archive.month == month,
-            )
-        )
-        existing_archive = existing_archive.scalar_one_or_none()
+        existing_archive = existing_archives.get((year, month))
 
         is_current_month = year == current_year and month == current_month
 
         if existing_archive:
-            if is_current_month or not existing_archive.downloaded:
-                existing_archive.is_current_month = is_current_month
-                existing_archive.downloaded = (
-                    False  # Reset to force re-download for current month
-                )
-            else:
+            if existing_archive.is_complete():
                 continue
+            # Re-checked with a conditional request, so an unchanged archive
+            # costs a single 304 response
+            existing_archive.is_current_month = is_current_month
             archive = existing_archive
         else:
             archive = Archive(
@@ -75,80 +218,156 @@ async def fetch_and_store_games(
             session.add(archive)
             total_archives += 1
 
-        # Fetch games for this archive
-        async with httpx.AsyncClient() as client:
-            games_response = await client.get(archive_url)
+        pending_archives.append(archive)
+
+    async def download(archive: Archive):
+        # A failed archive is skipped and, since it is not marked downloaded,
+        # fetched again on the next run
+        try:
+            return archive, await client.get(
+                archive.url, endpoint="archive", headers=archive.conditional_headers()
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Error downloading archive {archive.url}: {e!r}")
+            return archive, None
+
+    # Archives are downloaded concurrently over the shared client; results are
+    # written as they arrive since the session itself is not concurrency-safe.
+    download_tasks = [asyncio.create_task(download(archive)) for archive in pending_archives]
+    try:
+        for download_task in asyncio.as_completed(download_tasks):
+            archive, games_response = await download_task
+            if games_response is None:
+                failed_archives += 1
+                continue
+            if games_response.status_code == 304:
+                archive.last_download = datetime.utcnow()
+                not_modified_archives += 1
+                continue
             if games_response.status_code != 200:
+                logger.warning(
+                    f"Chess.com answered {games_response.status_code} for archive {archive.url}"
+                )
+                failed_archives += 1
                 continue
 
-            games_data = games_response.json()["games"]
-            for game_data in games_data:
-                game_id = game_data["url"].split("/")[-1]
-                existing_game = await session.execute(
-                    select(Game).where(Game.game_id == game_id)
-                )
-                existing_game = existing_game.scalar_one_or_none()
+            try:
+                games_data = games_response.json()["games"]
+                if archive.last_game_end_time:
+                    high_water_mark = archive.last_game_end_time.timestamp()
+                    games_data = [
+                        game_data for game_data in games_data
+                        if game_data["end_time"] > high_water_mark
+                    ]
+                end_times = [
+                    datetime.fromtimestamp(game_data["end_time"]) for game_data in games_data
+                ]
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Unreadable archive {archive.url}: {e!r}")
+                failed_archives += 1
+                continue
 
-                if existing_game and not is_current_month:
+            if games_data:
+                # A savepoint per archive, so one that fails to store does not
+                # roll back the others
+                try:
+                    async with session.begin_nested():
+                        total_games += await store_archive_games(
+                            session, player.id, games_data, archive.is_current_month
+                        )
+                except (SQLAlchemyError, ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Error storing archive {archive.url}: {e!r}")
+                    failed_archives += 1
                     continue
+                archive.last_game_end_time = max(end_times)
+                stored_end_times.extend(end_times)
 
-                eco_url = game_data.get("eco")
-                eco_name = Game.fetch_opening_name(eco_url) if eco_url else "Unknown"
-
-                if existing_game:
-                    # Update existing game for current month
-                    for key, value in game_data.items():
-                        if hasattr(existing_game, key):
-                            setattr(existing_game, key, value)
-                    existing_game.eco_name = eco_name
-                    game = existing_game
-                else:
-                    # Create new game
-                    game = Game(
-                        player_id=player.id,
-                        game_id=game_id,
-                        url=game_data["url"],
-                        pgn=game_data["pgn"],
-                        white_username=game_data["white"]["username"],
-                        black_username=game_data["black"]["username"],
-                        white_rating=game_data["white"]["rating"],
-                        black_rating=game_data["black"]["rating"],
-                        white_result=game_data["white"]["result"],
-                        black_result=game_data["black"]["result"],
-                        start_time=datetime.fromtimestamp(
-                            game_data.get("start_time", game_data["end_time"])
-                        ),
-                        end_time=datetime.fromtimestamp(game_data["end_time"]),
-                        time_control=game_data["time_control"],
-                        rules=game_data.get("rules"),
-                        eco=eco_url,
-                        eco_name=eco_name,
-                        tournament=game_data.get("tournament"),
-                        match=game_data.get("match"),
-                        analysis_result=json.dumps(game_data.get("accuracies", {})),
-                    )
-                    session.add(game)
-
-                game.set_analyzed_status()
-                total_games += 1
-
-        archive.downloaded = True
-        archive.last_download = datetime.utcnow()
+            archive.etag = games_response.headers.get("ETag")
+            archive.last_modified = games_response.headers.get("Last-Modified")
+            archive.downloaded = True
+            archive.last_download = datetime.utcnow()
+    finally:
+        # Nothing is left running when storing an archive fails
+        for download_task in download_tasks:
+            download_task.cancel()
 
+    await refresh_player_weeks(session, player.id, stored_end_times)
     await session.commit()
     return {
         "message": f"Processed {total_archives} archives and stored/updated {total_games} games for {username}",
         "total_archives": total_archives,
         "total_games": total_games,
+        "not_modified_archives": not_modified_archives,
+        "failed_archives": failed_archives,
     }
 
 
 @router.get("/players/{username}/games")
-async def get_player_games(username: str, session: AsyncSession = Depends(get_session)):
+async def get_player_games(
+    username: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_GAMES_PAGE_SIZE),
+    fields: Optional[str] = None,
+    time_control: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    color: Optional[Literal["white", "black"]] = None,
+    result: Optional[Literal["win", "loss", "draw"]] = None,
+    min_accuracy: Optional[float] = Query(None, ge=0, le=100),
+    max_accuracy: Optional[float] = Query(None, ge=0, le=100),
+    format: Literal["json", "ndjson"] = "json",
+    session: AsyncSession = Depends(get_session),
+):
     player = await get_or_create_player(username, session)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    games = await session.execute(select(Game).where(Game.player_id == player.id))
-    games = games.scalars().all()
-    return games
+    fields = parse_game_fields(fields)
+    query = filter_player_games(
+        select(*game_columns(fields)).where(Game.player_id == player.id),
+        player.username,
+        time_control=time_control,
+        since=since,
+        until=until,
+        color=color,
+        result=result,
+        min_accuracy=min_accuracy,
+        max_accuracy=max_accuracy,
+    ).order_by(Game.end_time.desc(), Game.id.desc())
+
+    if cursor:
+        end_time, last_id = decode_games_cursor(cursor)
+        query = query.where(tuple_(Game.end_time, Game.id) < (end_time, last_id))
+
+    if format == "ndjson":
+        # Streams every matching game unless a limit is given
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(
+            stream_games_ndjson(query, fields), media_type="application/x-ndjson"
+        )
+
+    limit = limit or DEFAULT_GAMES_PAGE_SIZE
+    rows = (await session.execute(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_games_cursor(rows[-1].end_time, rows[-1].id)
+
+    return {
+        "games": [game_fields(row, fields) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/games/{game_id}/pgn", response_class=PlainTextResponse)
+async def get_game_pgn(game_id: str, session: AsyncSession = Depends(get_session)):
+    result = await session.execute(select(Game).where(Game.game_id == game_id))
+    game = result.scalar_one_or_none()
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    game_pgn = stored_pgn(game.pgn, game.pgn_compressed)
+    if game_pgn is None:
+        game_pgn = await asyncio.to_thread(rebuild_pgn, game)
+    return PlainTextResponse(game_pgn, media_type="application/x-chess-pgn")
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Response
+from sqlmodel import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from ..database import get_session
+from ..models.game import Game
+from ..metrics import ANALYSIS_QUEUE_DEPTH
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(session: AsyncSession = Depends(get_session)):
+    # Queue depth is read from the database on each scrape
+    result = await session.execute(
+        select(func.count()).select_from(Game).where(Game.moves_analyzed == False)  # noqa: E712
+    )
+    ANALYSIS_QUEUE_DEPTH.set(result.scalar_one())
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -3,18 +3,19 @@ from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_session
 from ..models.player import Player
-import httpx
-from datetime import datetime
+from ..chesscom import get_chesscom_client
+from ..stats import get_weekly_stats, get_streaks
+from datetime import date, datetime, time, timedelta
+from typing import Optional
 
 router = APIRouter()
 
 
 async def fetch_player_data(username: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"https://api.chess.com/pub/player/{username}")
-        if response.status_code != 200:
-            return None
-        return response.json()
+    response = await get_chesscom_client().get_player(username)
+    if response.status_code != 200:
+        return None
+    return response.json()
 
 
 async def get_or_create_player(username: str, session: AsyncSession):
@@ -63,3 +64,22 @@ async def get_player(username: str, session: AsyncSession = Depends(get_session)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
     return player
+
+
+@router.get("/players/{username}/stats")
+async def get_player_stats(
+    username: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    time_control: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    player = await get_or_create_player(username, session)
+    if not player:
+        raise HTTPException(status_code=404, detail="Player not found")
+
+    since = datetime.combine(since, time.min) if since else None
+    until = datetime.combine(until + timedelta(days=1), time.min) if until else None
+    weeks = await get_weekly_stats(session, player.id, since, until, time_control)
+    streaks = await get_streaks(session, player, since, until, time_control)
+    return {"username": player.username, "weeks": weeks, "streaks": streaks}
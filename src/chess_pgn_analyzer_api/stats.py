@@ -0,0 +1,250 @@
+from sqlmodel import select, func, case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models.game import Game
+from .models.player import Player
+from .models.move_eval import MoveEval
+from .models.player_stats_weekly import PlayerStatsWeekly
+from .job_queue import db_now
+from .analysis.evaluation import BOOK_CATEGORY
+from datetime import datetime, time, timedelta
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAT_COLUMNS = [
+    "games",
+    "wins",
+    "losses",
+    "draws",
+    "white_games",
+    "rating_sum",
+    "accuracy_games",
+    "accuracy_sum",
+    "analyzed_moves",
+    "eval_diff_sum",
+    "blunders",
+    "mistakes",
+    "dubious_moves",
+    "updated_at",
+]
+
+
+def week_start(moment: datetime) -> datetime:
+    # Same boundary as Postgres' date_trunc('week'): Monday 00:00
+    return datetime.combine(moment.date() - timedelta(days=moment.weekday()), time.min)
+
+
+def game_outcome(is_white):
+    player_result = case((is_white, Game.white_result), else_=Game.black_result)
+    opponent_result = case((is_white, Game.black_result), else_=Game.white_result)
+    return case(
+        (player_result == "win", "win"), (opponent_result == "win", "loss"), else_="draw"
+    )
+
+
+def weekly_stats_query(
+    player_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    is_white = func.lower(Game.white_username) == func.lower(Player.username)
+    game_criteria = [Game.player_id == player_id]
+    if since:
+        game_criteria.append(Game.end_time >= since)
+    if until:
+        game_criteria.append(Game.end_time < until)
+
+    # The player's own moves per game, aggregated before joining so the game
+    # rows are not multiplied by their plies. Book moves were never searched
+    # and would dilute the averages.
+    moves = (
+        select(
+            MoveEval.game_id,
+            func.count().label("moves"),
+            func.sum(MoveEval.eval_diff).label("eval_diff_sum"),
+            func.count().filter(MoveEval.category == "??").label("blunders"),
+            func.count().filter(MoveEval.category == "?").label("mistakes"),
+            func.count().filter(MoveEval.category == "?!").label("dubious_moves"),
+        )
+        .join(Game, Game.id == MoveEval.game_id)
+        .join(Player, Player.id == Game.player_id)
+        .where(
+            *game_criteria,
+            MoveEval.side == case((is_white, "white"), else_="black"),
+            MoveEval.category != BOOK_CATEGORY,
+        )
+        .group_by(MoveEval.game_id)
+        .subquery()
+    )
+
+    outcome = game_outcome(is_white)
+    accuracy = case((is_white, Game.white_accuracy), else_=Game.black_accuracy)
+    week = func.date_trunc("week", Game.end_time)
+    return (
+        select(
+            Game.player_id,
+            week,
+            Game.time_control,
+            func.count(),
+            func.count().filter(outcome == "win"),
+            func.count().filter(outcome == "loss"),
+            func.count().filter(outcome == "draw"),
+            func.count().filter(is_white),
+            func.sum(case((is_white, Game.white_rating), else_=Game.black_rating)),
+            func.count(accuracy),
+            func.coalesce(func.sum(accuracy), 0),
+            func.coalesce(func.sum(moves.c.moves), 0),
+            func.coalesce(func.sum(moves.c.eval_diff_sum), 0),
+            func.coalesce(func.sum(moves.c.blunders), 0),
+            func.coalesce(func.sum(moves.c.mistakes), 0),
+            func.coalesce(func.sum(moves.c.dubious_moves), 0),
+            db_now(),
+        )
+        .join(Player, Player.id == Game.player_id)
+        .outerjoin(moves, moves.c.game_id == Game.id)
+        .where(*game_criteria)
+        .group_by(Game.player_id, week, Game.time_control)
+    )
+
+
+async def refresh_player_stats(
+    session: AsyncSession,
+    player_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Recomputes the player's weekly rows between the week-aligned bounds."""
+    # Serializes recomputes of the same player until the transaction ends.
+    # Otherwise two transactions that each see only their own new games could
+    # both write their rows, and the last commit would win.
+    await session.execute(select(func.pg_advisory_xact_lock(player_id)))
+    stmt = insert(PlayerStatsWeekly).from_select(
+        ["player_id", "week", "time_control", *STAT_COLUMNS],
+        weekly_stats_query(player_id, since, until),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["player_id", "week", "time_control"],
+        set_={column: stmt.excluded[column] for column in STAT_COLUMNS},
+    )
+    await session.execute(stmt)
+
+
+async def refresh_player_weeks(session: AsyncSession, player_id: int, end_times: list):
+    # Only the weeks containing new or changed games are recomputed
+    if not end_times:
+        return
+    since = week_start(min(end_times))
+    until = week_start(max(end_times)) + timedelta(days=7)
+    await refresh_player_stats(session, player_id, since, until)
+    logger.info(f"Refreshed weekly stats of player {player_id} from {since:%Y-%m-%d} to {until:%Y-%m-%d}")
+
+
+async def get_weekly_stats(
+    session: AsyncSession,
+    player_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    time_control: Optional[str] = None,
+) -> list:
+    criteria = [PlayerStatsWeekly.player_id == player_id]
+    if since:
+        criteria.append(PlayerStatsWeekly.week >= week_start(since))
+    if until:
+        criteria.append(PlayerStatsWeekly.week < until)
+    if time_control:
+        criteria.append(PlayerStatsWeekly.time_control == time_control)
+
+    result = await session.execute(
+        select(
+            PlayerStatsWeekly.week,
+            *[
+                func.sum(getattr(PlayerStatsWeekly, column)).label(column)
+                for column in STAT_COLUMNS
+                if column != "updated_at"
+            ],
+        )
+        .where(*criteria)
+        .group_by(PlayerStatsWeekly.week)
+        .order_by(PlayerStatsWeekly.week)
+    )
+
+    weeks = []
+    for row in result.mappings():
+        weeks.append({
+            "week": row["week"].date(),
+            "games": row["games"],
+            "wins": row["wins"],
+            "losses": row["losses"],
+            "draws": row["draws"],
+            "white_games": row["white_games"],
+            "avg_rating": row["rating_sum"] / row["games"] if row["games"] else None,
+            "avg_accuracy": (
+                row["accuracy_sum"] / row["accuracy_games"] if row["accuracy_games"] else None
+            ),
+            "analyzed_moves": row["analyzed_moves"],
+            "avg_eval_diff": (
+                row["eval_diff_sum"] / row["analyzed_moves"] if row["analyzed_moves"] else None
+            ),
+            "blunders": row["blunders"],
+            "mistakes": row["mistakes"],
+            "dubious_moves": row["dubious_moves"],
+        })
+    return weeks
+
+
+async def get_streaks(
+    session: AsyncSession,
+    player: Player,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    time_control: Optional[str] = None,
+) -> dict:
+    criteria = [Game.player_id == player.id]
+    if since:
+        criteria.append(Game.end_time >= since)
+    if until:
+        criteria.append(Game.end_time < until)
+    if time_control:
+        criteria.append(Game.time_control == time_control)
+
+    # Gaps and islands: within a run of equal outcomes the difference between
+    # the overall and the per-outcome row number stays constant.
+    outcome = game_outcome(func.lower(Game.white_username) == player.username.lower())
+    order = (Game.end_time, Game.id)
+    games = (
+        select(
+            outcome.label("outcome"),
+            Game.end_time,
+            (
+                func.row_number().over(order_by=order)
+                - func.row_number().over(partition_by=outcome, order_by=order)
+            ).label("run"),
+        )
+        .where(*criteria)
+        .subquery()
+    )
+    runs = (
+        select(
+            games.c.outcome,
+            func.count().label("length"),
+            func.max(games.c.end_time).label("ended"),
+        )
+        .group_by(games.c.outcome, games.c.run)
+        .subquery()
+    )
+
+    longest = await session.execute(
+        select(runs.c.outcome, func.max(runs.c.length)).group_by(runs.c.outcome)
+    )
+    longest = dict(longest.all())
+    current = await session.execute(
+        select(runs.c.outcome, runs.c.length).order_by(runs.c.ended.desc()).limit(1)
+    )
+    current = current.one_or_none()
+
+    return {
+        "longest_win": longest.get("win", 0),
+        "longest_loss": longest.get("loss", 0),
+        "longest_draw": longest.get("draw", 0),
+        "current": {"result": current.outcome, "length": current.length} if current else None,
+    }
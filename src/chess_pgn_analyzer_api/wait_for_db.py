@@ -3,8 +3,8 @@ import logging
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
 from .init_db import init_db, DATABASE_URL
+from .logging_config import configure_logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def wait_for_db(max_retries=60, delay=2):
@@ -28,4 +28,5 @@ def wait_for_db(max_retries=60, delay=2):
     raise Exception("Database connection failed after maximum retries")
 
 if __name__ == "__main__":
+    configure_logging()
     wait_for_db()
\ No newline at end of file
@@ -0,0 +1,241 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .database import background_session_maker, close_database
+from .job_queue import (
+    ANALYSIS_LEASE_SECONDS,
+    claim_jobs,
+    complete_job,
+    fail_job,
+    renew_leases,
+)
+from .stats import refresh_player_weeks
+from .pgn_storage import stored_pgn
+from .logging_config import configure_logging
+from .metrics import (
+    WORKER_METRICS_PORT,
+    ANALYSIS_SECONDS,
+    ANALYSIS_WAIT_SECONDS,
+    ANALYSIS_GAMES,
+    ENGINE_SEARCHES,
+    ENGINE_NODES,
+    ENGINE_POSITIONS_PER_SECOND,
+)
+from .analysis import (
+    ENGINE_POOL_SIZE,
+    analyze_game_pgn,
+    analyze_packed_game,
+    find_stockfish_path,
+    find_book_path,
+    get_engine_pool,
+    init_worker_process,
+    run_analysis,
+)
+from prometheus_client import start_http_server
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# One engine per worker process by default, so processes * ENGINE_THREADS
+# matches the number of cores.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", ENGINE_POOL_SIZE))
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", ANALYSIS_WORKERS * 2))
+ANALYSIS_POLL_INTERVAL = float(os.getenv("ANALYSIS_POLL_INTERVAL", "5"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Outcomes of analyze_claimed_game
+JOB_ANALYZED = "analyzed"
+JOB_FAILED = "failed"
+# The process pool broke; the job was failed and the pool must be restarted
+JOB_CRASHED = "crashed"
+# The lease expired and another worker took the job over
+JOB_STALE = "stale"
+
+
+def record_analysis(profile: str, stats: dict):
+    ANALYSIS_WAIT_SECONDS.observe(max(0.0, stats["wait_seconds"]))
+    ANALYSIS_SECONDS.labels(profile).observe(stats["seconds"])
+    ANALYSIS_GAMES.labels(profile, "analyzed").inc()
+    ENGINE_SEARCHES.inc(stats["searches"])
+    ENGINE_NODES.inc(stats["nodes"])
+    if stats["searches"] and stats["seconds"] > 0:
+        ENGINE_POSITIONS_PER_SECOND.observe(stats["searches"] / stats["seconds"])
+
+
+async def analyze_claimed_game(executor: ProcessPoolExecutor, job) -> str:
+    loop = asyncio.get_running_loop()
+    start_time = time.time()
+    try:
+        if job.moves is not None:
+            move_analysis, stats = await loop.run_in_executor(
+                executor,
+                run_analysis,
+                start_time,
+                analyze_packed_game,
+                job.moves,
+                job.initial_fen,
+                job.rules,
+                job.profile,
+            )
+        else:
+            move_analysis, stats = await loop.run_in_executor(
+                executor,
+                run_analysis,
+                start_time,
+                analyze_game_pgn,
+                stored_pgn(job.pgn, job.pgn_compressed),
+                job.profile,
+            )
+    except BrokenProcessPool:
+        # A crashed process breaks the whole pool and fails every job of the
+        # batch. The attempt still counts, so a game that crashes its process
+        # each time (engine segfault, out of memory) ends up dead-lettered
+        # instead of restarting the pool forever.
+        logger.error(f"Analysis process crashed while analyzing game {job.game_id}")
+        ANALYSIS_GAMES.labels(job.profile, "failed").inc()
+        await fail_claimed_job(job, "Analysis process crashed")
+        return JOB_CRASHED
+    except Exception as e:
+        logger.error(f"Error analyzing game {job.game_id}: {str(e)}")
+        ANALYSIS_GAMES.labels(job.profile, "failed").inc()
+        await fail_claimed_job(job, str(e))
+        return JOB_FAILED
+
+    record_analysis(job.profile, stats)
+    try:
+        async with background_session_maker() as session:
+            completed = await complete_job(
+                session, job.job_id, WORKER_ID, job.id, move_analysis
+            )
+    except Exception as e:
+        logger.error(f"Error storing analysis of game {job.game_id}: {str(e)}")
+        await fail_claimed_job(job, str(e))
+        return JOB_FAILED
+    if not completed:
+        logger.warning(
+            f"Discarding analysis of game {job.game_id}: job {job.job_id} was taken over "
+            f"by another worker"
+        )
+        return JOB_STALE
+    logger.info(f"Analysis completed for game {job.game_id} in {time.time() - start_time:.2f} seconds")
+    return JOB_ANALYZED
+
+
+async def fail_claimed_job(job, error: str):
+    # A job that cannot be marked failed is picked up again once its lease expires
+    try:
+        async with background_session_maker() as session:
+            await fail_job(session, job.job_id, WORKER_ID, error)
+    except Exception as e:
+        logger.error(f"Error failing job {job.job_id}, leaving it to its lease: {str(e)}")
+
+
+async def keep_leases(job_ids: list):
+    # Runs alongside a batch, so games still queued for a free process or
+    # taking long keep their jobs; finished jobs are no longer renewed
+    while True:
+        await asyncio.sleep(ANALYSIS_LEASE_SECONDS / 3)
+        try:
+            async with background_session_maker() as session:
+                await renew_leases(session, job_ids, WORKER_ID)
+        except Exception as e:
+            logger.warning(f"Error renewing analysis job leases: {str(e)}")
+
+
+async def refresh_analyzed_weeks(jobs: list):
+    # Once per batch rather than per game, since a batch usually holds many
+    # games of the same player and week
+    end_times = defaultdict(list)
+    for job in jobs:
+        end_times[job.player_id].append(job.end_time)
+    async with background_session_maker() as session:
+        # In player order, so that workers take the stats locks in the same order
+        for player_id in sorted(end_times):
+            await refresh_player_weeks(session, player_id, end_times[player_id])
+        await session.commit()
+
+
+def start_executor() -> ProcessPoolExecutor:
+    # Engines are started inside the worker processes; "spawn" keeps the
+    # parent's event loop and database connections out of the children.
+    return ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker_process,
+    )
+
+
+async def run_worker():
+    find_stockfish_path()
+    find_book_path()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"Starting analysis worker {WORKER_ID} with {ANALYSIS_WORKERS} process(es)")
+    if WORKER_METRICS_PORT:
+        start_http_server(WORKER_METRICS_PORT)
+        logger.info(f"Serving worker metrics on port {WORKER_METRICS_PORT}")
+    total_analyzed = 0
+    executor = start_executor()
+    try:
+        while not stop.is_set():
+            # A database error (connection reset, failover) only delays the
+            # next poll instead of stopping the worker
+            try:
+                async with background_session_maker() as session:
+                    jobs = await claim_jobs(session, WORKER_ID, ANALYSIS_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Error claiming analysis jobs: {str(e)}")
+                jobs = []
+            if not jobs:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=ANALYSIS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            lease_keeper = asyncio.create_task(keep_leases([job.job_id for job in jobs]))
+            try:
+                results = await asyncio.gather(
+                    *[analyze_claimed_game(executor, job) for job in jobs]
+                )
+            finally:
+                lease_keeper.cancel()
+            analyzed = [job for job, result in zip(jobs, results) if result == JOB_ANALYZED]
+            total_analyzed += len(analyzed)
+            try:
+                await refresh_analyzed_weeks(analyzed)
+            except Exception as e:
+                logger.error(f"Error refreshing weekly stats after analysis: {str(e)}")
+            logger.info(f"Finished batch of {len(jobs)} games. Total analyzed: {total_analyzed}")
+
+            if JOB_CRASHED in results:
+                crashed = results.count(JOB_CRASHED)
+                logger.warning(
+                    f"Analysis process pool broke, restarting it; {crashed} job(s) failed"
+                )
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = start_executor()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    await close_database()
+    logger.info(f"Analysis worker stopped. Total analyzed: {total_analyzed}")
+
+
+def main():
+    configure_logging()
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
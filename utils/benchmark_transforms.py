@@ -0,0 +1,117 @@
+"""Compares the dashboard's vectorized transforms with the per-row versions
+they replaced.
+
+    python utils/benchmark_transforms.py --sizes 10000 100000
+"""
+
+from transforms import first_moves, move_category_names, time_control_base
+import argparse
+import chess
+import chess.pgn
+import io
+import random
+import time
+import pandas as pd
+
+TIME_CONTROLS = ["60", "180", "180+2", "300", "600", "600+5", "1800"]
+CATEGORIES = ["??", "?", "?!", "∓", "=", "⩲", "±", "+", "++"]
+MOVES_PER_GAME = 40
+
+
+def random_pgn(rng: random.Random) -> str:
+    board = chess.Board()
+    game = chess.pgn.Game()
+    game.headers["Event"] = "Live Chess"
+    game.headers["Site"] = "Chess.com"
+    game.headers["TimeControl"] = rng.choice(TIME_CONTROLS)
+    node = game
+    clock = 180.0
+    for _ in range(rng.randint(20, 120)):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        move = rng.choice(moves)
+        board.push(move)
+        node = node.add_variation(move)
+        clock = max(0.0, clock - rng.random() * 3)
+        node.comment = f"[%clk 0:{int(clock) // 60:02d}:{clock % 60:04.1f}]"
+    game.headers["Result"] = board.result(claim_draw=True)
+    return str(game)
+
+
+def sample_data(size: int, seed: int = 0) -> tuple:
+    rng = random.Random(seed)
+    # A few hundred distinct games repeated; the transforms don't care
+    pgns = [random_pgn(rng) for _ in range(min(size, 500))]
+    games = pd.DataFrame({
+        "pgn": [pgns[i % len(pgns)] for i in range(size)],
+        "time_control": [rng.choice(TIME_CONTROLS) for _ in range(size)],
+    })
+    categories = pd.Series(rng.choices(CATEGORIES, k=size * MOVES_PER_GAME))
+    return games, categories
+
+
+def legacy_first_move(pgn):
+    game = chess.pgn.read_game(io.StringIO(pgn))
+    return game.variations[0].move.uci() if game.variations else None
+
+
+def legacy_categorize_move(category):
+    return {
+        "??": "Blunder",
+        "?": "Mistake",
+        "?!": "Dubious Move",
+        "∓": "Slight Disadvantage",
+        "=": "Equal",
+        "⩲": "Slight Advantage",
+        "±": "Clear Advantage",
+        "+": "Winning Advantage",
+        "++": "Decisive Advantage",
+    }.get(category, "Normal")
+
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run(size: int):
+    games, categories = sample_data(size)
+    cases = [
+        (
+            "first move",
+            lambda: games["pgn"].apply(legacy_first_move),
+            lambda: first_moves(games["pgn"]),
+        ),
+        (
+            "time control",
+            lambda: games["time_control"].apply(
+                lambda x: int(x.split("+")[0]) if "+" in x else int(x)
+            ),
+            lambda: time_control_base(games["time_control"]),
+        ),
+        (
+            "move category",
+            lambda: categories.map(legacy_categorize_move),
+            lambda: move_category_names(categories),
+        ),
+    ]
+
+    for name, legacy, vectorized in cases:
+        expected, legacy_seconds = timed(legacy)
+        result, vectorized_seconds = timed(vectorized)
+        assert expected.tolist() == result.tolist(), name
+        print(
+            f"{size:>8} {name:<14} per-row {legacy_seconds:9.3f}s  "
+            f"vectorized {vectorized_seconds:8.3f}s  "
+            f"speedup {legacy_seconds / vectorized_seconds:8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size)
@@ -1,37 +1,103 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, select
 from datetime import datetime, timedelta
 import pandas as pd
-import json
 from dotenv import load_dotenv
 import os
 from chess_pgn_analyzer_api.models.game import Game
 from chess_pgn_analyzer_api.models.player import Player
-from collections import Counter
-import chess.pgn
-import io
-import re
-import requests
-from bs4 import BeautifulSoup
-from functools import lru_cache
+from chess_pgn_analyzer_api.analytics import (
+    move_category_counts,
+    player_games,
+    weekly_accuracy as weekly_accuracy_query,
+    weekly_move_stats,
+)
+from transforms import first_moves, move_category_names, time_control_base
 
 load_dotenv()
 
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Query results are cached per filter combination; new games and analyses
+# show up once the entries expire.
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+
+
+def game_criteria(start_date, end_date, time_controls: tuple) -> list:
+    criteria = [Game.start_time >= start_date, Game.end_time <= end_date]
+    if time_controls:
+        criteria.append(Game.time_control.in_(time_controls))
+    return criteria
+
+
+# Every loader opens its own connection for the duration of the query, so no
+# session is held across Streamlit reruns.
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
+def load_players() -> pd.DataFrame:
+    with engine.connect() as connection:
+        return pd.read_sql(
+            select(Player.id, Player.username).order_by(Player.username), connection
+        )
+
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
+def load_time_controls(player_id: int) -> list:
+    with engine.connect() as connection:
+        result = connection.execute(
+            select(Game.time_control)
+            .where(Game.player_id == player_id)
+            .distinct()
+            .order_by(Game.time_control)
+        )
+        return result.scalars().all()
+
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
+def load_games(
+    player_id: int, username: str, start_date, end_date, time_controls: tuple
+) -> pd.DataFrame:
+    query = player_games(
+        player_id, username, *game_criteria(start_date, end_date, time_controls)
+    )
+    with engine.connect() as connection:
+        return pd.read_sql(query, connection)
+
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
+def load_weekly_accuracy(
+    player_id: int, username: str, start_date, end_date, time_controls: tuple
+) -> pd.DataFrame:
+    query = weekly_accuracy_query(
+        player_id, username, *game_criteria(start_date, end_date, time_controls)
+    )
+    with engine.connect() as connection:
+        return pd.read_sql(query, connection)
+
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
+def load_move_category_counts(
+    player_id: int, username: str, start_date, end_date, time_controls: tuple
+) -> pd.DataFrame:
+    query = move_category_counts(
+        player_id, username, *game_criteria(start_date, end_date, time_controls)
+    )
+    with engine.connect() as connection:
+        return pd.read_sql(query, connection)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
+def load_weekly_move_stats(
+    player_id: int, username: str, start_date, end_date, time_controls: tuple
+) -> pd.DataFrame:
+    query = weekly_move_stats(
+        player_id, username, *game_criteria(start_date, end_date, time_controls)
+    )
+    with engine.connect() as connection:
+        return pd.read_sql(query, connection)
 
 
 # Streamlit app
@@ -46,37 +112,25 @@ with col2:
     end_date = st.date_input("End Date", datetime.now())
 
 # Player selection
-db = next(get_db())
-players = db.query(Player).all()
-selected_player = st.selectbox("Select Player", options=[p.username for p in players])
+players = load_players()
+selected_player = st.selectbox("Select Player", options=players["username"])
+if not selected_player:
+    st.warning("No players available.")
+    st.stop()
+selected_player_id = int(players.loc[players["username"] == selected_player, "id"].iloc[0])
 
 # Time control filter
-time_controls = db.query(Game.time_control).distinct().all()
 selected_time_control = st.multiselect(
-    "Time Control", options=[tc[0] for tc in time_controls]
+    "Time Control", options=load_time_controls(selected_player_id)
 )
 
-# Fetch filtered game data
-query = (
-    db.query(Game)
-    .join(Player)
-    .filter(
-        Player.username == selected_player,
-        Game.start_time >= start_date,
-        Game.end_time <= end_date,
-    )
+filters = (
+    selected_player_id,
+    selected_player,
+    start_date,
+    end_date,
+    tuple(selected_time_control),
 )
-if selected_time_control:
-    query = query.filter(Game.time_control.in_(selected_time_control))
-games = query.all()
-
-
-def parse_analysis_result(result, player_color):
-    try:
-        parsed = json.loads(result)
-        return float(parsed.get(player_color, 0))
-    except (json.JSONDecodeError, TypeError, ValueError):
-        return 0
 
 
 def categorize_accuracy(accuracy):
@@ -92,119 +146,31 @@ def categorize_accuracy(accuracy):
         return "Poor"
 
 
-def parse_move_analysis(move_analysis, player_color):
-    if not move_analysis:
-        return []
-    try:
-        moves = json.loads(move_analysis)
-        player_moves = [
-            move
-            for i, move in enumerate(moves)
-            if i % 2 == (0 if player_color == "white" else 1)
-        ]
-        return player_moves
-    except (json.JSONDecodeError, TypeError):
-        return []
-
-
-def categorize_move(category):
-    categories = {
-        "??": "Blunder",
-        "?": "Mistake",
-        "?!": "Dubious Move",
-        "∓": "Slight Disadvantage",
-        "=": "Equal",
-        "⩲": "Slight Advantage",
-        "±": "Clear Advantage",
-        "+": "Winning Advantage",
-        "++": "Decisive Advantage",
-    }
-    return categories.get(category, "Normal")
-
-
-def get_first_move(pgn):
-    game = chess.pgn.read_game(io.StringIO(pgn))
-    return game.variations[0].move.uci() if game.variations else None
-
-
-@lru_cache(maxsize=128)
-def fetch_opening_name(eco_url):
-    if not eco_url or not isinstance(eco_url, str):
-        return "Unknown"
-    
-    try:
-        response = requests.get(eco_url, timeout=5)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the Twitter title meta tag
-        twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-        
-        if twitter_title and twitter_title.get('content'):
-            # Remove " - Chess Openings" from the end
-            opening_name = twitter_title['content'].replace(' - Chess Openings', '')
-            return opening_name
-        
-        return "Unknown"
-    except Exception as e:
-        print(f"Error fetching opening name: {str(e)}")
-        return "Unknown"
-
-
 try:
-    df = pd.DataFrame(
-        [
-            {
-                "date": game.end_time.date(),
-                "player_color": "white" if game.white_username == selected_player else "black",
-                "player_accuracy": parse_analysis_result(
-                    game.analysis_result,
-                    "white" if game.white_username == selected_player else "black",
-                ),
-                "player_rating": game.white_rating if game.white_username == selected_player else game.black_rating,
-                "opponent_rating": game.black_rating if game.white_username == selected_player else game.white_rating,
-                "time_control": game.time_control,
-                "result": game.white_result if game.white_username == selected_player else game.black_result,
-                "move_analysis": parse_move_analysis(
-                    getattr(game, "move_analysis", None),
-                    "white" if game.white_username == selected_player else "black",
-                ),
-                "eco": game.eco,
-                "eco_name": game.eco_name,
-                "pgn": game.pgn,
-            }
-            for game in games
-        ]
-    )
+    df = load_games(*filters)
+    df["player_accuracy"] = df["player_accuracy"].fillna(0)
 
     # Calculate weekly averages
     df["date"] = pd.to_datetime(df["date"])
     df["week"] = df["date"].dt.to_period("W")
-    weekly_accuracy = df.groupby("week")["player_accuracy"].mean().reset_index()
-    weekly_accuracy["date"] = weekly_accuracy["week"].dt.to_timestamp()
+    # Averaged in Postgres over games that have an accuracy
+    weekly_accuracy = load_weekly_accuracy(*filters).rename(
+        columns={"week": "date", "avg_accuracy": "player_accuracy"}
+    )
     weekly_rating = df.groupby("week")["player_rating"].mean().reset_index()
     weekly_rating["date"] = weekly_rating["week"].dt.to_timestamp()
 
-    # Flatten move analysis data
-    move_data = []
-    for _, row in df.iterrows():
-        for move in row["move_analysis"]:
-            move_data.append(
-                {
-                    "date": row["date"],
-                    "category": categorize_move(move.get("category", "")),
-                    "eval_diff": move.get("eval_diff"),
-                }
-            )
-
-    move_df = pd.DataFrame(move_data)
+    # Move statistics are aggregated by Postgres from the move_eval table
+    move_quality_counts = load_move_category_counts(*filters)
+    move_quality_counts["category"] = move_category_names(move_quality_counts["category"])
+    move_quality_counts = move_quality_counts.groupby("category")["moves"].sum()
 
     # Check if we have any move analysis data
-    if not move_df.empty:
+    if not move_quality_counts.empty:
         st.subheader("Move Analysis")
 
         # Move Quality Distribution
         st.subheader("Move Quality Distribution")
-        move_quality_counts = move_df["category"].value_counts()
         fig_move_quality = px.pie(
             values=move_quality_counts.values,
             names=move_quality_counts.index,
@@ -214,14 +180,10 @@ try:
 
         # Average Move Performance Over Time
         st.subheader("Average Move Performance Over Time")
-        move_df["date"] = pd.to_datetime(move_df["date"])
-        move_df["week"] = move_df["date"].dt.to_period("W")
-        weekly_move_performance = (
-            move_df.groupby("week")["eval_diff"].mean().reset_index()
+        weekly_move_performance = load_weekly_move_stats(*filters).rename(
+            columns={"week": "date", "avg_eval_diff": "eval_diff"}
         )
-        weekly_move_performance["date"] = weekly_move_performance[
-            'week'
-        ].dt.to_timestamp()
+        weekly_move_performance["eval_diff"] = weekly_move_performance["eval_diff"].astype(float)
 
         fig_move_performance = px.line(
             weekly_move_performance,
@@ -238,7 +200,7 @@ try:
     # Display summary of available data
     st.subheader("Data Summary")
     total_games = len(df)
-    games_with_move_analysis = df["move_analysis"].apply(len).gt(0).sum()
+    games_with_move_analysis = df["moves_analyzed"].sum()
     st.write(f"Total games: {total_games}")
     st.write(f"Games with move analysis: {games_with_move_analysis}")
     st.write(
@@ -276,7 +238,7 @@ try:
 
     # 2. Time management analysis
     st.subheader("Time Management")
-    df["time_control_minutes"] = df["time_control"].apply(lambda x: int(x.split("+")[0]) if "+" in x else int(x))
+    df["time_control_minutes"] = time_control_base(df["time_control"])
     fig_time_accuracy = px.scatter(
         df,
         x="time_control_minutes",
@@ -314,7 +276,7 @@ try:
 
     # 7. First move analysis
     st.subheader("First Move Analysis")
-    df["first_move"] = df["pgn"].apply(get_first_move)
+    df["first_move"] = df["first_move"].fillna(first_moves(df["pgn"]))
     first_move_counts = df["first_move"].value_counts().head(5)
     fig_first_moves = px.bar(
         x=first_move_counts.index,
@@ -473,12 +435,4 @@ try:
 
 except Exception as e:
     st.error(f"Error creating DataFrame: {str(e)}")
-    st.write("Sample of problematic data:")
-    for game in games[:5]:
-        st.write(
-            f"Game ID: {game.id}, ECO: {game.eco}, Analysis Result: {game.analysis_result}, Move Analysis: {getattr(game, 'move_analysis', 'Not available')}"
-        )
     st.stop()
-
-# Close the database session
-db.close()
@@ -0,0 +1,137 @@
+"""Generates the chess.com archive fixtures used by chess_pgn_analyzer_api.bench.
+
+    python utils/make_bench_fixtures.py
+
+Games start from a handful of common openings and continue with random legal
+moves, so analysis sees the shared opening positions of a real archive.
+"""
+
+from datetime import datetime
+from pathlib import Path
+import argparse
+import chess
+import chess.pgn
+import json
+import random
+
+FIXTURES_PATH = Path(__file__).parent.parent / "src" / "chess_pgn_analyzer_api" / "data" / "bench"
+USERNAME = "bench_player"
+OPPONENTS = ["opponent_a", "opponent_b", "opponent_c", "opponent_d"]
+ARCHIVES = [(2024, 1), (2024, 2)]
+GAMES_PER_ARCHIVE = 40
+
+OPENINGS = [
+    ("Italian-Game", "e4 e5 Nf3 Nc6 Bc4 Bc5 c3 Nf6 d3 d6"),
+    ("Ruy-Lopez-Opening", "e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 O-O Be7"),
+    ("Sicilian-Defense", "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6"),
+    ("French-Defense", "e4 e6 d4 d5 Nc3 Nf6 Bg5 Be7 e5 Nfd7"),
+    ("Caro-Kann-Defense", "e4 c6 d4 d5 Nc3 dxe4 Nxe4 Bf5 Ng3 Bg6"),
+    ("Scandinavian-Defense", "e4 d5 exd5 Qxd5 Nc3 Qa5 d4 Nf6 Nf3 Bf5"),
+    ("Queens-Gambit-Declined", "d4 d5 c4 e6 Nc3 Nf6 Bg5 Be7 e3 O-O"),
+    ("Slav-Defense", "d4 d5 c4 c6 Nf3 Nf6 Nc3 dxc4 a4 Bf5"),
+    ("London-System", "d4 d5 Bf4 Nf6 e3 e6 Nf3 c5 c3 Nc6"),
+    ("Kings-Indian-Defense", "d4 Nf6 c4 g6 Nc3 Bg7 e4 d6 Nf3 O-O"),
+    ("English-Opening", "c4 e5 Nc3 Nf6 Nf3 Nc6 g3 d5 cxd5 Nxd5"),
+    ("Pirc-Defense", "e4 d6 d4 Nf6 Nc3 g6 f4 Bg7 Nf3 O-O"),
+]
+
+TIME_CONTROLS = [("180", 1800, 0), ("180+2", 1800, 20), ("600", 6000, 0)]
+
+
+def play_game(rng: random.Random, opening: str, start_clock: int, increment: int) -> tuple:
+    board = chess.Board()
+    game = chess.pgn.Game()
+    node = game
+    clocks = [start_clock, start_clock]
+    sans = opening.split()
+    for ply in range(rng.randint(30, 110)):
+        if ply < len(sans):
+            move = board.parse_san(sans[ply])
+        else:
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            # Prefer captures a little so games end in a result
+            captures = [move for move in moves if board.is_capture(move)]
+            move = rng.choice(captures if captures and rng.random() < 0.4 else moves)
+        side = ply % 2
+        clocks[side] = max(1, clocks[side] - rng.randint(5, 80) + increment)
+        node = node.add_variation(move)
+        node.set_clock(clocks[side] / 10)
+        board.push(move)
+        if board.is_game_over():
+            break
+    return game, board
+
+
+def game_json(rng: random.Random, year: int, month: int, index: int) -> dict:
+    eco, opening = rng.choice(OPENINGS)
+    time_control, start_clock, increment = rng.choice(TIME_CONTROLS)
+    game, board = play_game(rng, opening, start_clock, increment)
+
+    as_white = rng.random() < 0.5
+    opponent = rng.choice(OPPONENTS)
+    white, black = (USERNAME, opponent) if as_white else (opponent, USERNAME)
+    outcome = board.outcome(claim_draw=True)
+    if outcome is None:
+        winner = rng.choice([chess.WHITE, chess.BLACK])
+        results = ("win", "resigned") if winner == chess.WHITE else ("resigned", "win")
+    elif outcome.winner is None:
+        results = ("stalemate", "stalemate") if board.is_stalemate() else ("agreed", "agreed")
+    else:
+        results = ("win", "checkmated") if outcome.winner == chess.WHITE else ("checkmated", "win")
+    result = {"win": "1-0", "resigned": "0-1", "checkmated": "0-1"}.get(results[0], "1/2-1/2")
+
+    end_time = int(datetime(year, month, 1 + index % 28, 12, index % 60).timestamp())
+    game_id = f"{year}{month:02d}{index:04d}"
+    url = f"https://www.chess.com/game/live/{game_id}"
+    eco_url = f"https://www.chess.com/openings/{eco}"
+    ratings = (rng.randint(1200, 1800), rng.randint(1200, 1800))
+
+    game.headers["Event"] = "Live Chess"
+    game.headers["Site"] = "Chess.com"
+    game.headers["Date"] = f"{year}.{month:02d}.{1 + index % 28:02d}"
+    game.headers["Round"] = "-"
+    game.headers["White"] = white
+    game.headers["Black"] = black
+    game.headers["Result"] = result
+    game.headers["ECOUrl"] = eco_url
+    game.headers["WhiteElo"] = str(ratings[0])
+    game.headers["BlackElo"] = str(ratings[1])
+    game.headers["TimeControl"] = time_control
+    game.headers["Link"] = url
+
+    data = {
+        "url": url,
+        "pgn": str(game),
+        "time_control": time_control,
+        "end_time": end_time,
+        "rated": True,
+        "time_class": "blitz" if time_control.startswith("180") else "rapid",
+        "rules": "chess",
+        "eco": eco_url,
+        "white": {"rating": ratings[0], "result": results[0], "username": white},
+        "black": {"rating": ratings[1], "result": results[1], "username": black},
+    }
+    if rng.random() < 0.5:
+        data["accuracies"] = {
+            "white": round(rng.uniform(50, 95), 2),
+            "black": round(rng.uniform(50, 95), 2),
+        }
+    return data
+
+
+def main(seed: int):
+    rng = random.Random(seed)
+    FIXTURES_PATH.mkdir(parents=True, exist_ok=True)
+    for year, month in ARCHIVES:
+        games = [game_json(rng, year, month, index) for index in range(GAMES_PER_ARCHIVE)]
+        path = FIXTURES_PATH / f"archive_{year}_{month:02d}.json"
+        path.write_text(json.dumps({"games": games}, indent=1))
+        print(f"Wrote {len(games)} games to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args().seed)
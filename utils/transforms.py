@@ -0,0 +1,53 @@
+import chess
+import numpy as np
+import pandas as pd
+
+# Column-at-a-time versions of the dashboard's per-game transforms. Each works
+# on a whole Series with pandas string methods instead of a Python call per row.
+
+MOVE_CATEGORY_NAMES = {
+    "??": "Blunder",
+    "?": "Mistake",
+    "?!": "Dubious Move",
+    "∓": "Slight Disadvantage",
+    "=": "Equal",
+    "⩲": "Slight Advantage",
+    "±": "Clear Advantage",
+    "+": "Winning Advantage",
+    "++": "Decisive Advantage",
+    "book": "Book Move",
+}
+
+# The first move of the movetext, i.e. the token after "1." at the start of a
+# line (header lines start with "[")
+FIRST_MOVE_PATTERN = r"(?m)^1\.\s*([^\s{(;]+)"
+
+# SAN -> UCI for the 20 legal first moves from the standard position
+FIRST_MOVE_UCI = {
+    chess.Board().san(move): move.uci() for move in chess.Board().legal_moves
+}
+
+
+def move_category_names(categories: pd.Series) -> pd.Series:
+    return categories.map(MOVE_CATEGORY_NAMES).fillna("Normal")
+
+
+def first_moves(pgns: pd.Series) -> pd.Series:
+    """Returns each game's first move in UCI notation.
+
+    Games from a custom start position keep the SAN of their first move.
+    """
+    san = pgns.str.extract(FIRST_MOVE_PATTERN, expand=False).str.rstrip("+#!?")
+    return san.map(FIRST_MOVE_UCI).fillna(san)
+
+
+def time_control_base(time_controls: pd.Series) -> pd.Series:
+    # "180+2" -> 180; daily time controls ("1/86400") have no base and give NaN.
+    # A player only uses a handful of time controls, so each distinct value is
+    # parsed once and the results are gathered by factorized code.
+    codes, uniques = pd.factorize(time_controls)
+    bases = pd.to_numeric(
+        pd.Series(uniques, dtype=object).str.split("+", n=1).str[0], errors="coerce"
+    ).to_numpy(dtype=float)
+    bases = np.append(bases, np.nan)  # code -1 marks a missing value
+    return pd.Series(bases[codes], index=time_controls.index)